@@ -131,6 +131,7 @@ app.add_middleware(
 def on_startup():
     """Initialize DB schema and start background schedulers."""
     connector.init_db()
+    connector.ensure_config()
     start_scheduler()
 
 @app.on_event("shutdown")
@@ -69,15 +69,10 @@ def run_analysis_job(batch_size: int = 10):
         # Step 2: Scan for inventory matches
         matches = connector.find_inventory_in_purchases()
         logger.info(f"Analysis job: {len(matches)} inventory matches found")
-        for m in matches:
-            try:
-                connector.save_inventory_match(
-                    m['purchase_id'], m['purchase_item_id'], m['product_id'],
-                    m['product_name'], m['matched_price'], m['matched_date'],
-                    m['match_method']
-                )
-            except Exception as e:
-                logger.warning(f"Match save error: {e}")
+        try:
+            connector.save_inventory_matches(matches)
+        except Exception as e:
+            logger.warning(f"Match save error: {e}")
 
         pending = len(connector.get_pending_matches())
         analysis_status["processed"] = processed
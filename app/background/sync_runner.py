@@ -1,6 +1,7 @@
 """Sync runner — orchestrates full Holded data sync.
 
-Runs each sync step sequentially and tracks status for the API.
+Writes each sync step sequentially (fetches are prefetched in the
+background) and tracks status for the API.
 """
 
 import logging
@@ -21,17 +22,8 @@ def run_sync():
     sync_status["errors"] = []
     try:
         connector.init_db()
-        steps = [
-            ("accounts", connector.sync_accounts),
-            ("contacts", connector.sync_contacts),
-            ("products", connector.sync_products),
-            ("invoices", connector.sync_invoices),
-            ("purchases", connector.sync_purchases),
-            ("estimates", connector.sync_estimates),
-            ("projects", connector.sync_projects),
-            ("payments", connector.sync_payments),
-        ]
-        for step_name, step_fn in steps:
+        # Fetches run ahead on worker threads while each step is written here.
+        for step_name, step_fn in connector.prefetched_sync_steps():
             try:
                 step_fn()
             except Exception as e:
@@ -9,6 +9,7 @@ All DB access goes through these primitives. Other modules import from here
 
 import os
 import json
+import atexit
 import sqlite3
 import logging
 import threading
@@ -42,6 +43,57 @@ if not _USE_SQLITE:
 
 DB_NAME = os.getenv("DB_NAME", "holded.db")  # SQLite mode only
 
+# sqlite3 keeps a per-connection LRU of compiled statements keyed by SQL text,
+# so repeated queries skip sqlite3_prepare_v2. The stdlib default (128) is
+# smaller than the number of distinct statements a full sync + dashboard pass
+# issues, which caused evictions and re-parses on the hot helpers.
+_SQLITE_CACHED_STATEMENTS = 256
+
+# Per-connection PRAGMAs applied on every SQLite connect. journal_mode=WAL is
+# persistent in the database file and is set once by init_db(); with WAL,
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+# busy_timeout makes a writer wait for a competing lock instead of failing
+# with "database is locked"; it is set explicitly rather than relying on the
+# sqlite3 module's default connect timeout.
+_SQLITE_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",      # 64 MiB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MiB memory-mapped reads
+)
+
+# ── Connection reuse (SQLite) — one bounded, process-wide free list ──────────
+# release_db() parks SQLite connections here and get_db() reuses them, so
+# PRAGMAs and schema parsing are paid once per connection rather than once per
+# call. The list is shared by all threads and capped, so short-lived threads
+# (write sync-backs) cannot accumulate open handles: only idle connections are
+# held here, at most _SQLITE_POOL_MAX of them. A nested get_db() (before the
+# outer connection is released) still gets its own connection. Each connection
+# remembers the DB_NAME it was opened with so a changed path (tests) never
+# reuses it.
+_SQLITE_POOL_MAX = 4         # idle connections kept for the whole process
+_sqlite_free = []            # idle connections, most recently released last
+_sqlite_free_lock = threading.Lock()
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers the DB_NAME it was opened with."""
+    db_name = None
+
+
+def _close_sqlite_pool():
+    """Close every idle pooled SQLite connection (registered with atexit)."""
+    with _sqlite_free_lock:
+        conns = list(_sqlite_free)
+        _sqlite_free.clear()
+    for conn in conns:
+        _close_sqlite(conn)
+
+
+atexit.register(_close_sqlite_pool)
+
+
 # ── Connection pooling (PostgreSQL) — thread-safe init ───────────────────────
 _pool = None
 _pool_lock = threading.Lock()
@@ -58,11 +110,35 @@ def _get_pool():
     return _pool
 
 
+def _sqlite_connect():
+    """Open a SQLite connection with the shared settings (row factory, statement cache, PRAGMAs)."""
+    # check_same_thread=False: a pooled connection may be reused by another
+    # thread; the pool hands each one to a single caller at a time.
+    conn = sqlite3.connect(DB_NAME, cached_statements=_SQLITE_CACHED_STATEMENTS,
+                           check_same_thread=False, factory=_SQLiteConnection)
+    conn.db_name = DB_NAME
+    conn.row_factory = sqlite3.Row
+    for pragma in _SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
 def get_db():
     """Return a database connection for the active backend."""
     if _USE_SQLITE:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        stale = []
+        conn = None
+        with _sqlite_free_lock:
+            while _sqlite_free:
+                candidate = _sqlite_free.pop()
+                if candidate.db_name == DB_NAME:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for old in stale:
+            _close_sqlite(old)
+        if conn is None:
+            conn = _sqlite_connect()
         return conn
     try:
         conn = _get_pool().getconn()
@@ -83,10 +159,29 @@ def get_db():
     return conn
 
 
+def _close_sqlite(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
 def release_db(conn):
-    """Return a PostgreSQL connection to the pool, rolling back any uncommitted transaction."""
+    """Return a connection to its pool, rolling back any uncommitted transaction."""
     if _USE_SQLITE:
-        conn.close()
+        with _sqlite_free_lock:
+            if any(c is conn for c in _sqlite_free):
+                return  # already released
+        try:
+            conn.rollback()
+        except Exception:
+            _close_sqlite(conn)  # closed or broken — don't pool it
+            return
+        with _sqlite_free_lock:
+            if getattr(conn, 'db_name', None) and len(_sqlite_free) < _SQLITE_POOL_MAX:
+                _sqlite_free.append(conn)
+                return
+        _close_sqlite(conn)
     else:
         try:
             conn.rollback()
@@ -104,6 +199,31 @@ def _cursor(conn):
     return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
 
+def _sqlite_dict_row_factory():
+    """sqlite3 row_factory building plain dicts (the RealDictCursor equivalent).
+    Column names are read from cursor.description once per statement: the
+    description object only changes when the cursor executes again."""
+    last = [None, ()]
+
+    def _dict_row(cursor, row):
+        desc = cursor.description
+        if desc is not last[0]:
+            last[0] = desc
+            last[1] = tuple(col[0] for col in desc)
+        return dict(zip(last[1], row))
+    return _dict_row
+
+
+def _dict_cursor(conn):
+    """Return a cursor whose rows are plain dicts on both backends.
+    Use for reads returned to callers as-is, so they need no dict(row) copy."""
+    if _USE_SQLITE:
+        cur = conn.cursor()
+        cur.row_factory = _sqlite_dict_row_factory()
+        return cur
+    return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+
 def _q(sql):
     """Convert SQLite ? placeholders to PostgreSQL %s when needed."""
     if _USE_SQLITE:
@@ -111,6 +231,30 @@ def _q(sql):
     return sql.replace("?", "%s")
 
 
+# Rows per statement in _insert_many(). 50 rows × 14 columns (the widest
+# line-item insert) stays under SQLite's 999 bound-parameter limit.
+_MULTI_ROW_CHUNK = 50
+
+
+def _insert_many(cursor, insert_head, rows, chunk_size=_MULTI_ROW_CHUNK):
+    """Insert `rows` (equal-length tuples) using multi-row VALUES statements.
+
+    `insert_head` is the statement up to VALUES, e.g. "INSERT INTO t (a, b)".
+    Every full chunk reuses the same statement text, so it is compiled once;
+    the remainder goes through executemany with a single-row statement."""
+    if not rows:
+        return
+    ph = '?' if _USE_SQLITE else '%s'
+    group = '(' + ','.join([ph] * len(rows[0])) + ')'
+    n_full = len(rows) - len(rows) % chunk_size
+    if n_full:
+        sql = f"{insert_head} VALUES {','.join([group] * chunk_size)}"
+        for i in range(0, n_full, chunk_size):
+            cursor.execute(sql, [v for row in rows[i:i + chunk_size] for v in row])
+    if n_full < len(rows):
+        cursor.executemany(f"{insert_head} VALUES {group}", rows[n_full:])
+
+
 def _num(val):
     """Sanitize a value for a NUMERIC column: empty strings → None (NULL).
     PostgreSQL rejects empty strings in NUMERIC columns; SQLite accepts them silently."""
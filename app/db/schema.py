@@ -10,11 +10,22 @@ from app.db.connection import get_db, release_db, _cursor, _USE_SQLITE
 
 logger = logging.getLogger(__name__)
 
+# Page size for a newly created SQLite file. Larger pages mean shallower
+# B-trees and fewer reads for the full-table scans of a sync. It can only be
+# chosen before the first page is written (and not at all once in WAL mode),
+# so existing databases keep the size they were created with.
+_SQLITE_PAGE_SIZE = 16384
+
 
 def init_db():
     """Initialize all database tables, run column migrations, seed data."""
     conn = get_db()
     try:
+        if _USE_SQLITE:
+            if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+                conn.execute(f"PRAGMA page_size={_SQLITE_PAGE_SIZE}")
+            # WAL lets readers run during a sync and is remembered by the file
+            conn.execute("PRAGMA journal_mode=WAL")
         _init_db_inner(conn)
     finally:
         release_db(conn)
@@ -284,6 +295,17 @@ def _init_db_inner(conn):
         )
     ''')
 
+    # product_revenue: per-product invoice revenue, derived from invoice_items.
+    # Kept current by refresh_product_revenue() whenever invoice lines are written,
+    # so amortization reads are point lookups instead of a GROUP BY scan.
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS product_revenue (
+            product_id TEXT PRIMARY KEY,
+            revenue {_real} NOT NULL DEFAULT 0,
+            line_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
     # ── AI tables ────────────────────────────────────────────────────────────
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS ai_history (
@@ -595,13 +617,20 @@ def _init_db_inner(conn):
               AND a.purchase_price > 0
         ''')
 
+    # ── Rebuild derived product_revenue (self-heals rows written by old code) ──
+    from app.domain.amortization import refresh_product_revenue
+    refresh_product_revenue(cursor)
+
     # ── Indexes ───────────────────────────────────────────────────────────────
     for idx_sql in [
         'CREATE INDEX IF NOT EXISTS idx_invoices_contact ON invoices(contact_id)',
         'CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date)',
         'CREATE INDEX IF NOT EXISTS idx_purchases_contact ON purchase_invoices(contact_id)',
         'CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchase_invoices(date)',
-        'CREATE INDEX IF NOT EXISTS idx_inv_items_product ON invoice_items(product_id)',
+        # Covers product_revenue's per-product aggregation (index-only scan);
+        # supersedes the old single-column idx_inv_items_product.
+        'DROP INDEX IF EXISTS idx_inv_items_product',
+        'CREATE INDEX IF NOT EXISTS idx_inv_items_product_revenue ON invoice_items(product_id, subtotal, units, price)',
         'CREATE INDEX IF NOT EXISTS idx_inv_items_invoice ON invoice_items(invoice_id)',
         'CREATE INDEX IF NOT EXISTS idx_pur_items_product ON purchase_items(product_id)',
         'CREATE INDEX IF NOT EXISTS idx_pur_items_purchase ON purchase_items(purchase_id)',
@@ -614,6 +643,7 @@ def _init_db_inner(conn):
         # Added in Fase 1 refactor
         'CREATE INDEX IF NOT EXISTS idx_invoices_project_code ON invoices(project_code)',
         'CREATE INDEX IF NOT EXISTS idx_est_items_estimate ON estimate_items(estimate_id)',
+        'CREATE INDEX IF NOT EXISTS idx_inv_matches_status ON inventory_matches(status)',
     ]:
         cursor.execute(idx_sql)
 
@@ -1,11 +1,13 @@
-"""Runtime settings — reload_config, get_setting, save_setting.
+"""Runtime settings — reload_config, ensure_config, get_setting, save_setting.
 
 Extracted from connector.py (L111-168) during Fase 1 refactor.
 Modifies API_KEY/HEADERS in connection.py when holded_api_key changes.
 """
 
 import os
+import time
 import logging
+import threading
 
 from dotenv import load_dotenv
 
@@ -13,20 +15,79 @@ import app.db.connection as _conn
 
 logger = logging.getLogger(__name__)
 
+# In-process copy of the settings table: (stamp, {key: value}). Reads are
+# served from it while the stamp matches; save_setting() drops it. The stamp
+# catches writes from other processes: on SQLite it is the mtime/size of the
+# database and its WAL file, on PostgreSQL a _PG_SETTINGS_TTL-second bucket.
+# On PostgreSQL that is a deliberate staleness window: a value saved by one
+# worker (uploads/reports dir, API keys) can stay invisible to the other
+# workers for up to _PG_SETTINGS_TTL seconds, even right after save_setting().
+# Only the saving process drops its copy immediately.
+_PG_SETTINGS_TTL = 30
+_settings_cache = None
 
-def reload_config():
-    """Reload API_KEY and HEADERS from DB settings (fallback: .env)."""
+
+def _settings_stamp():
+    if _conn._USE_SQLITE:
+        stamp = [_conn.DB_NAME]
+        for path in (_conn.DB_NAME, _conn.DB_NAME + "-wal"):
+            try:
+                st = os.stat(path)
+                stamp += [st.st_mtime_ns, st.st_size]
+            except OSError:
+                stamp += [None, None]
+        return tuple(stamp)
+    return int(time.monotonic() // _PG_SETTINGS_TTL)
+
+
+def _load_settings():
+    """Return all settings as a dict, from the cache when still current."""
+    global _settings_cache
+    stamp = _settings_stamp()
+    cached = _settings_cache
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
     conn = _conn.get_db()
     try:
         cursor = _conn._cursor(conn)
+        cursor.execute("SELECT key, value FROM settings")
+        settings = {_conn._row_val(r, "key", 0): _conn._row_val(r, "value", 1) for r in cursor.fetchall()}
+    finally:
+        _conn.release_db(conn)
+    _settings_cache = (stamp, settings)
+    return settings
+
+
+def invalidate_settings_cache():
+    """Drop the cached settings so the next read hits the database."""
+    global _settings_cache
+    _settings_cache = None
+
+
+# reload_config() first runs via ensure_config() — at API startup, before each
+# Holded request, and from connector.API_KEY — not at import, so importing the
+# package never opens the database. Anything sending HEADERS itself must call
+# ensure_config() first. Set once a reload has read the settings table.
+_config_loaded = False
+_config_lock = threading.Lock()
+
+
+def ensure_config():
+    """Load API_KEY/HEADERS from settings unless that already happened."""
+    if _config_loaded:
+        return
+    with _config_lock:
+        if not _config_loaded:
+            reload_config()
+
+
+def reload_config():
+    """Reload API_KEY and HEADERS from DB settings (fallback: .env)."""
+    global _config_loaded
+    try:
         # settings table is created by schema.init_db() — if it doesn't exist yet,
         # the except block handles it gracefully (first run before init_db).
-        cursor.execute("SELECT key, value FROM settings")
-        rows = cursor.fetchall()
-        if _conn._USE_SQLITE:
-            settings = {row[0]: row[1] for row in rows}
-        else:
-            settings = {row["key"]: row["value"] for row in rows}
+        settings = _load_settings()
 
         if 'holded_api_key' in settings:
             _conn.API_KEY = settings['holded_api_key']
@@ -35,29 +96,23 @@ def reload_config():
             _conn.API_KEY = os.getenv("HOLDED_API_KEY")
 
         _conn.HEADERS["key"] = _conn.API_KEY
+        _config_loaded = True
     except Exception:
         # DB not ready yet (first run before init_db) — keep current config
         logger.debug("reload_config failed (DB not ready?), keeping current config")
-    finally:
-        _conn.release_db(conn)
 
 
 def get_setting(key, default=None):
-    """Read a single setting from the settings table."""
-    conn = _conn.get_db()
-    try:
-        cursor = _conn._cursor(conn)
-        cursor.execute(_conn._q("SELECT value FROM settings WHERE key = ?"), (key,))
-        row = cursor.fetchone()
-        if row is None:
-            return default
-        return row[0] if _conn._USE_SQLITE else row["value"]
-    finally:
-        _conn.release_db(conn)
+    """Read a single setting (served from the in-process settings cache).
+    On PostgreSQL a value saved by another worker may be up to
+    _PG_SETTINGS_TTL seconds old; see the note on _settings_cache."""
+    return _load_settings().get(key, default)
 
 
 def save_setting(key, value):
-    """Upsert a single setting in the settings table."""
+    """Upsert a single setting in the settings table.
+    Visible at once in this process; other PostgreSQL workers pick it up
+    within _PG_SETTINGS_TTL seconds."""
     conn = _conn.get_db()
     try:
         cursor = _conn._cursor(conn)
@@ -71,10 +126,4 @@ def save_setting(key, value):
         conn.commit()
     finally:
         _conn.release_db(conn)
-
-
-# Initial load — safe even if DB doesn't exist yet
-try:
-    reload_config()
-except Exception:
-    pass
+    invalidate_settings_cache()
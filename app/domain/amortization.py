@@ -5,54 +5,181 @@ proportional revenue attribution from pack products.
 """
 
 import logging
+import threading
 
-from app.db.connection import get_db, release_db, _cursor, _q, _fetch_one_val, _USE_SQLITE
+from app.db.connection import get_db, release_db, _cursor, _dict_cursor, _q, _fetch_one_val, _USE_SQLITE
 
 logger = logging.getLogger(__name__)
 
+# Revenue of one invoice line: subtotal when present, else units × price.
+_LINE_REVENUE = """
+    CASE WHEN subtotal IS NOT NULL AND subtotal > 0
+         THEN subtotal
+         ELSE COALESCE(units, 0) * COALESCE(price, 0)
+    END"""
+
+# Rows pulled per fetchmany() round when streaming amortizations.
+_FETCH_CHUNK = 1000
+
+# Product ids per incremental product_revenue refresh statement (well under
+# SQLite's bound-parameter limit).
+_REVENUE_CHUNK = 500
+
+# ── Dialect-specialized SQL ──────────────────────────────────────────────────
+# _USE_SQLITE is fixed at import, so placeholder rewriting (? → %s) and the
+# NOW() token are resolved once here instead of on every call.
+_PH = '?' if _USE_SQLITE else '%s'
+_NOW = "datetime('now')" if _USE_SQLITE else "NOW()"
+
+_SQL_SUM_AP_COST = _q(
+    "SELECT COALESCE(SUM(cost_override), 0) AS total FROM amortization_purchases WHERE amortization_id=?")
+_SQL_SET_PURCHASE_PRICE = _q(f"UPDATE amortizations SET purchase_price=?, updated_at={_NOW} WHERE id=?")
+_SQL_GET_AP_PARENT = _q("SELECT amortization_id FROM amortization_purchases WHERE id=?")
+_SQL_DELETE_AP = _q("DELETE FROM amortization_purchases WHERE id=?")
+_SQL_GET_PRODUCT = _q("SELECT id, name, kind, price FROM products WHERE id = ?")
+_SQL_GET_PRODUCT_KIND = _q("SELECT kind FROM products WHERE id = ?")
+_SQL_DELETE_AMORT = _q("DELETE FROM amortizations WHERE id=?")
+_SQL_GET_AP_DETAIL = _q('''
+    SELECT
+        ap.id,
+        ap.amortization_id,
+        ap.purchase_id,
+        ap.purchase_item_id,
+        ap.cost_override,
+        ap.allocation_note,
+        ap.created_at,
+        pi.contact_name  AS supplier,
+        pi."desc"        AS invoice_desc,
+        pi.date          AS invoice_date,
+        pi."desc"        AS doc_number,
+        pit.name         AS item_name,
+        pit.price        AS item_unit_price,
+        pit.units        AS item_units
+    FROM amortization_purchases ap
+    LEFT JOIN purchase_invoices pi  ON pi.id  = ap.purchase_id
+    LEFT JOIN purchase_items    pit ON pit.id = ap.purchase_item_id
+    WHERE ap.amortization_id = ?
+    ORDER BY ap.created_at
+''')
+_SQL_PACK_COMPONENTS = _q('''
+    SELECT pc.component_id, pc.quantity, p.name, p.price
+    FROM pack_components pc
+    LEFT JOIN products p ON p.id = pc.component_id
+    WHERE pc.pack_id = ?
+''')
+_SQL_PACK_MEMBERSHIP = _q('''
+    SELECT pc.pack_id, pc.quantity, p.name, p.price
+    FROM pack_components pc
+    LEFT JOIN products p ON p.id = pc.pack_id
+    WHERE pc.component_id = ?
+''')
+
+# Cheap fingerprint of everything get_amortizations() depends on. Catches
+# writes made outside this process (other workers, scripts); in-process
+# writers also call invalidate_amortization_cache() explicitly. The large
+# derived tables are summarised by aggregates; the small tables the result is
+# built from row by row (amortizations, the product_type_rules it joins, and
+# pack_components) are read whole and hashed, so an edit that keeps counts and
+# updated_at unchanged (same-second write, same-size pack change) still shows.
+_SQL_AMORT_FINGERPRINT = '''
+    SELECT
+        (SELECT COUNT(*) FROM product_revenue)       AS revenue_count,
+        (SELECT SUM(revenue) FROM product_revenue)   AS revenue_total,
+        (SELECT SUM(price) FROM products)            AS price_total
+'''
+_SQL_AMORT_FINGERPRINT_ROWS = (
+    '''SELECT id, product_id, product_name, purchase_price, purchase_date, notes,
+              product_type, created_at, updated_at
+       FROM amortizations ORDER BY id''',
+    "SELECT type_key, label, irpf_pct, is_expense FROM product_type_rules ORDER BY type_key",
+    "SELECT pack_id, component_id, quantity FROM pack_components ORDER BY pack_id, component_id",
+)
+
+# Memoized get_amortizations(): (fingerprint, rows). _amort_cache_gen is bumped
+# on every invalidation so a computation that raced with a write is not stored.
+_amort_cache = None
+_amort_cache_gen = 0
+_amort_cache_lock = threading.Lock()
+
+
+def invalidate_amortization_cache():
+    """Drop the memoized get_amortizations() result. Call after committing a write."""
+    global _amort_cache, _amort_cache_gen
+    with _amort_cache_lock:
+        _amort_cache = None
+        _amort_cache_gen += 1
+
+
+def _amortization_fingerprint():
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        if _USE_SQLITE:
+            cursor.row_factory = None  # plain tuples: hashable, cheap to build
+        cursor.execute(_SQL_AMORT_FINGERPRINT)
+        key = [tuple(cursor.fetchone())]
+        for sql in _SQL_AMORT_FINGERPRINT_ROWS:
+            cursor.execute(sql)
+            key.append(hash(tuple(map(tuple, cursor))))
+        return tuple(key)
+    finally:
+        release_db(conn)
+
+
+def refresh_product_revenue(cursor, product_ids=None):
+    """Recompute product_revenue rows from invoice_items.
+
+    Invoice-line writers pass the product ids whose lines they touched (old
+    and new ids of the rewritten documents) and call this inside their
+    transaction, before commit: only those rows are upserted, or deleted when
+    a product has no lines left. Writers never DELETE the whole table, so two
+    concurrent invoice writers cannot collide on the primary key. Without
+    `product_ids` the table is rebuilt from scratch (init_db only)."""
+    if product_ids is None:
+        cursor.execute("DELETE FROM product_revenue")
+        cursor.execute(f'''
+            INSERT INTO product_revenue (product_id, revenue, line_count)
+            SELECT product_id, COALESCE(SUM({_LINE_REVENUE}), 0), COUNT(*)
+            FROM invoice_items
+            WHERE product_id IS NOT NULL
+            GROUP BY product_id
+        ''')
+        return
+    product_ids = sorted({pid for pid in product_ids if pid})
+    for i in range(0, len(product_ids), _REVENUE_CHUNK):
+        chunk = product_ids[i:i + _REVENUE_CHUNK]
+        in_list = ','.join([_PH] * len(chunk))
+        cursor.execute(f'''
+            INSERT INTO product_revenue (product_id, revenue, line_count)
+            SELECT product_id, COALESCE(SUM({_LINE_REVENUE}), 0), COUNT(*)
+            FROM invoice_items
+            WHERE product_id IN ({in_list})
+            GROUP BY product_id
+            ON CONFLICT (product_id) DO UPDATE
+                SET revenue = excluded.revenue, line_count = excluded.line_count
+        ''', chunk)
+        cursor.execute(f'''
+            DELETE FROM product_revenue
+            WHERE product_id IN ({in_list})
+              AND NOT EXISTS (SELECT 1 FROM invoice_items ii
+                              WHERE ii.product_id = product_revenue.product_id)
+        ''', chunk)
+
 
 def _recalc_purchase_price(cursor, amortization_id):
     """Recompute amortizations.purchase_price = SUM(cost_override) from amortization_purchases."""
-    cursor.execute(
-        _q("SELECT COALESCE(SUM(cost_override), 0) AS total FROM amortization_purchases WHERE amortization_id=?"),
-        (amortization_id,)
-    )
+    cursor.execute(_SQL_SUM_AP_COST, (amortization_id,))
     total = _fetch_one_val(cursor, "total") or 0
-    now_expr = "datetime('now')" if _USE_SQLITE else "NOW()"
-    cursor.execute(
-        _q(f"UPDATE amortizations SET purchase_price=?, updated_at={now_expr} WHERE id=?"),
-        (total, amortization_id)
-    )
+    cursor.execute(_SQL_SET_PURCHASE_PRICE, (total, amortization_id))
 
 
 def get_amortization_purchases(amortization_id):
     """Return all purchase links for one amortization, with purchase invoice details."""
     conn = get_db()
     try:
-        cursor = _cursor(conn)
-        cursor.execute(_q('''
-            SELECT
-                ap.id,
-                ap.amortization_id,
-                ap.purchase_id,
-                ap.purchase_item_id,
-                ap.cost_override,
-                ap.allocation_note,
-                ap.created_at,
-                pi.contact_name  AS supplier,
-                pi."desc"        AS invoice_desc,
-                pi.date          AS invoice_date,
-                pi."desc"        AS doc_number,
-                pit.name         AS item_name,
-                pit.price        AS item_unit_price,
-                pit.units        AS item_units
-            FROM amortization_purchases ap
-            LEFT JOIN purchase_invoices pi  ON pi.id  = ap.purchase_id
-            LEFT JOIN purchase_items    pit ON pit.id = ap.purchase_item_id
-            WHERE ap.amortization_id = ?
-            ORDER BY ap.created_at
-        '''), (amortization_id,))
-        return [dict(r) for r in cursor.fetchall()]
+        cursor = _dict_cursor(conn)
+        cursor.execute(_SQL_GET_AP_DETAIL, (amortization_id,))
+        return cursor.fetchall()
     finally:
         release_db(conn)
 
@@ -83,6 +210,7 @@ def add_amortization_purchase(amortization_id, cost_override, allocation_note=""
             new_id = row['id'] if row else None
         _recalc_purchase_price(cursor, amortization_id)
         conn.commit()
+        invalidate_amortization_cache()
         return new_id
     finally:
         release_db(conn)
@@ -94,7 +222,7 @@ def update_amortization_purchase(purchase_link_id, cost_override=None, allocatio
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        ph = '%s' if not _USE_SQLITE else '?'
+        ph = _PH
         fields, values = [], []
         if cost_override is not None:
             fields.append(f"cost_override={ph}"); values.append(float(cost_override))
@@ -109,12 +237,13 @@ def update_amortization_purchase(purchase_link_id, cost_override=None, allocatio
         values.append(purchase_link_id)
         cursor.execute(f"UPDATE amortization_purchases SET {', '.join(fields)} WHERE id={ph}", values)
         # Get parent amortization_id to recalc
-        cursor.execute(_q("SELECT amortization_id FROM amortization_purchases WHERE id=?"), (purchase_link_id,))
+        cursor.execute(_SQL_GET_AP_PARENT, (purchase_link_id,))
         row = cursor.fetchone()
         if row:
             parent_id = row['amortization_id'] if isinstance(row, dict) else row[0]
             _recalc_purchase_price(cursor, parent_id)
         conn.commit()
+        invalidate_amortization_cache()
         return cursor.rowcount > 0
     finally:
         release_db(conn)
@@ -125,14 +254,15 @@ def delete_amortization_purchase(purchase_link_id):
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        cursor.execute(_q("SELECT amortization_id FROM amortization_purchases WHERE id=?"), (purchase_link_id,))
+        cursor.execute(_SQL_GET_AP_PARENT, (purchase_link_id,))
         row = cursor.fetchone()
         if not row:
             return False
         amort_id = row['amortization_id'] if isinstance(row, dict) else row[0]
-        cursor.execute(_q("DELETE FROM amortization_purchases WHERE id=?"), (purchase_link_id,))
+        cursor.execute(_SQL_DELETE_AP, (purchase_link_id,))
         _recalc_purchase_price(cursor, amort_id)
         conn.commit()
+        invalidate_amortization_cache()
         return True
     finally:
         release_db(conn)
@@ -142,9 +272,9 @@ def get_product_type_rules() -> list:
     """Return all product type fiscal rules."""
     conn = get_db()
     try:
-        cursor = _cursor(conn)
+        cursor = _dict_cursor(conn)
         cursor.execute("SELECT * FROM product_type_rules ORDER BY is_expense, irpf_pct DESC")
-        return [dict(r) for r in cursor.fetchall()]
+        return cursor.fetchall()
     finally:
         release_db(conn)
 
@@ -154,89 +284,52 @@ def get_pack_info(product_id):
     Returns dict with 'kind', 'components' (if pack), and 'member_of' (if component)."""
     conn = get_db()
     try:
-        cursor = _cursor(conn)
-        cursor.execute(_q("SELECT id, name, kind, price FROM products WHERE id = ?"), (product_id,))
+        cursor = _dict_cursor(conn)
+        cursor.execute(_SQL_GET_PRODUCT, (product_id,))
         prod = cursor.fetchone()
         if not prod:
             return None
-        prod = dict(prod)
         result = {"product_id": product_id, "name": prod["name"], "kind": prod["kind"] or "simple"}
 
         if prod["kind"] == "pack":
-            cursor.execute(_q('''
-                SELECT pc.component_id, pc.quantity, p.name, p.price
-                FROM pack_components pc
-                LEFT JOIN products p ON p.id = pc.component_id
-                WHERE pc.pack_id = ?
-            '''), (product_id,))
-            result["components"] = [dict(r) for r in cursor.fetchall()]
+            cursor.execute(_SQL_PACK_COMPONENTS, (product_id,))
+            result["components"] = cursor.fetchall()
         else:
-            cursor.execute(_q('''
-                SELECT pc.pack_id, pc.quantity, p.name, p.price
-                FROM pack_components pc
-                LEFT JOIN products p ON p.id = pc.pack_id
-                WHERE pc.component_id = ?
-            '''), (product_id,))
-            result["member_of"] = [dict(r) for r in cursor.fetchall()]
+            cursor.execute(_SQL_PACK_MEMBERSHIP, (product_id,))
+            result["member_of"] = cursor.fetchall()
 
         return result
     finally:
         release_db(conn)
 
 
-def get_amortizations():
-    """Return all amortizations with real-time revenue calculation from invoice_items.
+def iter_amortizations(chunk_size=_FETCH_CHUNK):
+    """Yield amortizations one by one with real-time revenue from invoice_items.
     Revenue includes both direct revenue (product_id match) and pack revenue
     (attributed proportionally from packs that contain the component product).
-    Also returns product_type and its fiscal rule (irpf_pct)."""
+    Also returns product_type and its fiscal rule (irpf_pct).
+
+    Pack lookups are loaded first; the main result set is then streamed with
+    fetchmany(chunk_size) so only one chunk of rows is held at a time."""
     conn = get_db()
     try:
-        cursor = _cursor(conn)
+        cursor = _dict_cursor(conn)
 
-        # 1. Direct revenue per amortization
-        cursor.execute('''
-            SELECT
-                a.id,
-                a.product_id,
-                a.product_name,
-                a.purchase_price,
-                a.purchase_date,
-                a.notes,
-                a.product_type,
-                a.created_at,
-                COALESCE(SUM(
-                    CASE
-                        WHEN ii.subtotal IS NOT NULL AND ii.subtotal > 0
-                        THEN ii.subtotal
-                        ELSE COALESCE(ii.units, 0) * COALESCE(ii.price, 0)
-                    END
-                ), 0.0) AS direct_revenue,
-                ptr.label        AS type_label,
-                ptr.irpf_pct     AS irpf_pct,
-                ptr.is_expense   AS is_expense
-            FROM amortizations a
-            LEFT JOIN invoice_items ii  ON ii.product_id  = a.product_id
-            LEFT JOIN product_type_rules ptr ON ptr.type_key = a.product_type
-            GROUP BY a.id, a.product_id, a.product_name, a.purchase_price,
-                     a.purchase_date, a.notes, a.product_type, a.created_at,
-                     ptr.label, ptr.irpf_pct, ptr.is_expense
-            ORDER BY a.purchase_date DESC
-        ''')
-        rows = [dict(r) for r in cursor.fetchall()]
-
-        # 2. Load pack_components with component prices for proportional attribution
+        # 1. Load components of every pack that contains an amortized product
         cursor.execute('''
             SELECT pc.pack_id, pc.component_id, pc.quantity, COALESCE(p.price, 0) AS component_price
             FROM pack_components pc
             LEFT JOIN products p ON p.id = pc.component_id
+            WHERE pc.pack_id IN (
+                SELECT pack_id FROM pack_components
+                WHERE component_id IN (SELECT product_id FROM amortizations)
+            )
         ''')
-        comp_rows = cursor.fetchall()
 
         # Build lookups: component_id → list of packs, pack_id → list of components
         comp_to_packs = {}   # component_id → [pack_id, ...]
         pack_contents = {}   # pack_id → [(component_id, qty, price), ...]
-        for cr in comp_rows:
-            cr = dict(cr)
+        for cr in cursor:
             pack_id = cr['pack_id']
             comp_id = cr['component_id']
             qty = float(cr['quantity'] or 1)
@@ -244,75 +337,98 @@ def get_amortizations():
             comp_to_packs.setdefault(comp_id, []).append(pack_id)
             pack_contents.setdefault(pack_id, []).append((comp_id, qty, price))
 
-        # Collect all amortized product_ids that appear in some pack
-        amort_product_ids = {r['product_id'] for r in rows}
-        relevant_pack_ids = set()
-        for pid in amort_product_ids:
-            for pack_id in comp_to_packs.get(pid, []):
-                relevant_pack_ids.add(pack_id)
-
-        # 3. Get pack invoice revenue for relevant packs
+        # 2. Get pack invoice revenue for relevant packs (from product_revenue)
         pack_revenue_map = {}  # pack_id → total_invoiced
         pack_count_map = {}    # pack_id → number of invoice lines
-        if relevant_pack_ids:
-            placeholders = ','.join(['?' if _USE_SQLITE else '%s'] * len(relevant_pack_ids))
-            pack_ids_list = list(relevant_pack_ids)
+        if pack_contents:
+            placeholders = ','.join([_PH] * len(pack_contents))
+            pack_ids_list = list(pack_contents)
             cursor.execute(f'''
-                SELECT product_id,
-                       COALESCE(SUM(
-                           CASE WHEN subtotal IS NOT NULL AND subtotal > 0
-                                THEN subtotal
-                                ELSE COALESCE(units, 0) * COALESCE(price, 0)
-                           END
-                       ), 0) AS pack_total,
-                       COUNT(*) AS line_count
-                FROM invoice_items
+                SELECT product_id, revenue AS pack_total, line_count
+                FROM product_revenue
                 WHERE product_id IN ({placeholders})
-                GROUP BY product_id
             ''', pack_ids_list)
-            for pr in cursor.fetchall():
-                pr = dict(pr)
+            for pr in cursor:
                 pack_revenue_map[pr['product_id']] = float(pr['pack_total'])
                 pack_count_map[pr['product_id']] = pr['line_count']
 
+        # 3. Direct revenue per amortization — point lookup in product_revenue
+        cursor.execute('''
+            SELECT
+                a.id,
+                a.product_id,
+                a.product_name,
+                a.purchase_price,
+                a.purchase_date,
+                a.notes,
+                a.product_type,
+                a.created_at,
+                COALESCE(rev.revenue, 0.0) AS direct_revenue,
+                ptr.label        AS type_label,
+                ptr.irpf_pct     AS irpf_pct,
+                ptr.is_expense   AS is_expense
+            FROM amortizations a
+            LEFT JOIN product_revenue rev ON rev.product_id = a.product_id
+            LEFT JOIN product_type_rules ptr ON ptr.type_key = a.product_type
+            ORDER BY a.purchase_date DESC
+        ''')
+
         # 4. Attribute pack revenue proportionally to each component
-        result = []
-        for d in rows:
-            pack_revenue = 0.0
-            pack_count = 0
-            component_packs = comp_to_packs.get(d['product_id'], [])
-            for pack_id in component_packs:
-                total_pack_invoiced = pack_revenue_map.get(pack_id, 0)
-                if total_pack_invoiced <= 0:
-                    continue
-                # Calculate this component's share of the pack
-                components = pack_contents.get(pack_id, [])
-                total_pack_value = sum(c_price * c_qty for _, c_qty, c_price in components)
-                my_entry = next((c for c in components if c[0] == d['product_id']), None)
-                if my_entry and total_pack_value > 0:
-                    my_value = my_entry[2] * my_entry[1]  # price * qty
-                    share = my_value / total_pack_value
-                elif components:
-                    share = 1.0 / len(components)  # equal split fallback
-                else:
-                    share = 1.0
-                pack_revenue += total_pack_invoiced * share
-                pack_count += pack_count_map.get(pack_id, 0)
-
-            d['direct_revenue'] = float(d.pop('direct_revenue', 0))
-            d['pack_revenue'] = round(pack_revenue, 2)
-            d['pack_count'] = pack_count
-            d['total_revenue'] = round(d['direct_revenue'] + pack_revenue, 2)
-            d['purchase_price'] = float(d['purchase_price'] or 0)
-            d['profit'] = d['total_revenue'] - d['purchase_price']
-            d['roi_pct'] = round((d['profit'] / d['purchase_price'] * 100), 2) if d['purchase_price'] > 0 else 0
-            d['status'] = 'AMORTIZADO' if d['profit'] >= 0 else 'EN CURSO'
-            result.append(d)
-        return result
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for d in chunk:
+                pack_revenue = 0.0
+                pack_count = 0
+                for pack_id in comp_to_packs.get(d['product_id'], []):
+                    total_pack_invoiced = pack_revenue_map.get(pack_id, 0)
+                    if total_pack_invoiced <= 0:
+                        continue
+                    # Calculate this component's share of the pack
+                    components = pack_contents.get(pack_id, [])
+                    total_pack_value = sum(c_price * c_qty for _, c_qty, c_price in components)
+                    my_entry = next((c for c in components if c[0] == d['product_id']), None)
+                    if my_entry and total_pack_value > 0:
+                        my_value = my_entry[2] * my_entry[1]  # price * qty
+                        share = my_value / total_pack_value
+                    elif components:
+                        share = 1.0 / len(components)  # equal split fallback
+                    else:
+                        share = 1.0
+                    pack_revenue += total_pack_invoiced * share
+                    pack_count += pack_count_map.get(pack_id, 0)
+
+                d['direct_revenue'] = float(d.pop('direct_revenue', 0))
+                d['pack_revenue'] = round(pack_revenue, 2)
+                d['pack_count'] = pack_count
+                d['total_revenue'] = round(d['direct_revenue'] + pack_revenue, 2)
+                d['purchase_price'] = float(d['purchase_price'] or 0)
+                d['profit'] = d['total_revenue'] - d['purchase_price']
+                d['roi_pct'] = round((d['profit'] / d['purchase_price'] * 100), 2) if d['purchase_price'] > 0 else 0
+                d['status'] = 'AMORTIZADO' if d['profit'] >= 0 else 'EN CURSO'
+                yield d
     finally:
         release_db(conn)
 
 
+def get_amortizations():
+    """Return all amortizations as a list (see iter_amortizations).
+    Memoized until a write invalidates it or the table fingerprint changes;
+    the row dicts are shared between callers, so treat them as read-only."""
+    global _amort_cache
+    key = _amortization_fingerprint()
+    cached = _amort_cache
+    if cached is not None and cached[0] == key:
+        return list(cached[1])
+    gen = _amort_cache_gen
+    rows = list(iter_amortizations())
+    with _amort_cache_lock:
+        if gen == _amort_cache_gen:
+            _amort_cache = (key, rows)
+    return list(rows)
+
+
 def add_amortization(product_id, product_name, purchase_price, purchase_date,
                      notes="", product_type="alquiler"):
     """Add a product to amortization tracking.
@@ -321,7 +437,7 @@ def add_amortization(product_id, product_name, purchase_price, purchase_date,
     try:
         cursor = _cursor(conn)
         # Guard: reject pack products — track components instead
-        cursor.execute(_q("SELECT kind FROM products WHERE id = ?"), (product_id,))
+        cursor.execute(_SQL_GET_PRODUCT_KIND, (product_id,))
         prod_row = cursor.fetchone()
         if prod_row:
             kind = prod_row['kind'] if isinstance(prod_row, dict) else prod_row[0]
@@ -349,6 +465,7 @@ def add_amortization(product_id, product_name, purchase_price, purchase_date,
             row = cursor.fetchone()
             new_id = row['id'] if row else None
         conn.commit()
+        invalidate_amortization_cache()
         return new_id
     except ValueError:
         conn.rollback()
@@ -366,7 +483,7 @@ def update_amortization(amort_id, purchase_price=None, purchase_date=None,
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        ph = '%s' if not _USE_SQLITE else '?'
+        ph = _PH
         fields, values = [], []
         if purchase_price is not None:
             fields.append(f"purchase_price={ph}"); values.append(purchase_price)
@@ -378,11 +495,11 @@ def update_amortization(amort_id, purchase_price=None, purchase_date=None,
             fields.append(f"product_type={ph}"); values.append(product_type)
         if not fields:
             return False
-        now_expr = "datetime('now')" if _USE_SQLITE else "NOW()"
-        fields.append(f"updated_at={now_expr}")
+        fields.append(f"updated_at={_NOW}")
         values.append(amort_id)
         cursor.execute(f"UPDATE amortizations SET {', '.join(fields)} WHERE id={ph}", values)
         conn.commit()
+        invalidate_amortization_cache()
         return cursor.rowcount > 0
     finally:
         release_db(conn)
@@ -393,26 +510,32 @@ def delete_amortization(amort_id):
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        cursor.execute(_q("DELETE FROM amortizations WHERE id=?"), (amort_id,))
+        cursor.execute(_SQL_DELETE_AMORT, (amort_id,))
         conn.commit()
+        invalidate_amortization_cache()
         return cursor.rowcount > 0
     finally:
         release_db(conn)
 
 
 def get_amortization_summary():
-    """Global summary: total invested, total recovered, global profit, counts."""
-    rows = get_amortizations()
-    total_invested = sum(r['purchase_price'] for r in rows)
-    total_revenue = sum(r['total_revenue'] for r in rows)
-    total_profit = sum(r['profit'] for r in rows)
-    amortized_count = sum(1 for r in rows if r['status'] == 'AMORTIZADO')
+    """Global summary: total invested, total recovered, global profit, counts.
+    Built from get_amortizations(), so it shares that function's cache."""
+    total_invested = total_revenue = total_profit = 0.0
+    total_products = amortized_count = 0
+    for r in get_amortizations():
+        total_invested += r['purchase_price']
+        total_revenue += r['total_revenue']
+        total_profit += r['profit']
+        total_products += 1
+        if r['status'] == 'AMORTIZADO':
+            amortized_count += 1
     return {
         "total_invested": round(total_invested, 2),
         "total_revenue": round(total_revenue, 2),
         "total_profit": round(total_profit, 2),
         "global_roi_pct": round((total_profit / total_invested * 100), 2) if total_invested > 0 else 0,
-        "total_products": len(rows),
+        "total_products": total_products,
         "amortized_count": amortized_count,
-        "in_progress_count": len(rows) - amortized_count
+        "in_progress_count": total_products - amortized_count
     }
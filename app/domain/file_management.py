@@ -81,21 +81,23 @@ def set_reports_dir(path):
 
 
 def list_uploaded_files(limit=50):
-    """List uploaded files with metadata.
+    """List the `limit` most recently modified uploaded files with metadata.
     Returns list of dicts with: name, size, uploaded_at, type"""
     uploads_dir = get_uploads_dir()
     os.makedirs(uploads_dir, exist_ok=True)
-    files = []
+    entries = []
     try:
-        for f in os.listdir(uploads_dir)[:limit]:
-            fpath = os.path.join(uploads_dir, f)
-            if os.path.isfile(fpath):
-                files.append({
-                    "name": f,
-                    "size": os.path.getsize(fpath),
-                    "uploaded_at": os.path.getmtime(fpath),
-                    "type": f.split(".")[-1] if "." in f else "unknown"
-                })
+        # scandir yields type info from the directory read; stat() is cached per entry
+        with os.scandir(uploads_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    entries.append((entry.name, entry.stat()))
     except Exception as e:
         logger.error(f"Error listing uploaded files: {str(e)}")
-    return sorted(files, key=lambda x: x["uploaded_at"], reverse=True)
+    entries.sort(key=lambda e: e[1].st_mtime, reverse=True)
+    return [{
+        "name": name,
+        "size": st.st_size,
+        "uploaded_at": st.st_mtime,
+        "type": name.rsplit(".", 1)[-1] if "." in name else "unknown"
+    } for name, st in entries[:limit]]
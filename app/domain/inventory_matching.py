@@ -6,13 +6,55 @@ products in the catalog, enabling ROI tracking via amortizations.
 
 import re
 import logging
+import threading
+from functools import lru_cache
 from difflib import SequenceMatcher
 from datetime import datetime
 
-from app.db.connection import get_db, release_db, _cursor, _q, _fetch_one_val, _USE_SQLITE
+from app.db.connection import get_db, release_db, _cursor, _dict_cursor, _q, _fetch_one_val, _USE_SQLITE
 
 logger = logging.getLogger(__name__)
 
+# ── Dialect-specialized SQL ──────────────────────────────────────────────────
+# _USE_SQLITE is fixed at import, so statements are built (and ? rewritten to
+# %s) once here; identical text per call also keeps SQLite's statement cache hot.
+_SQL_PRODUCTS = "SELECT id, name FROM products"
+_SQL_PRICED_PURCHASE_ITEMS = '''
+    SELECT pit.id AS item_id, pit.purchase_id, pit.product_id,
+           pit.name AS item_name, pit.price, pit.units,
+           pi.date, pi.contact_name
+    FROM purchase_items pit
+    JOIN purchase_invoices pi ON pi.id = pit.purchase_id
+    WHERE pit.price IS NOT NULL AND pit.price > 0
+'''
+_SQL_AMORTIZED_PRODUCTS = "SELECT product_id FROM amortizations"
+_SQL_MATCHED_PRODUCTS = "SELECT product_id FROM inventory_matches"
+
+# Insert a pending match, skipping an existing (purchase_id, product_id) pair.
+_SQL_INSERT_MATCH = _q(f'''
+    INSERT {"OR IGNORE " if _USE_SQLITE else ""}INTO inventory_matches
+        (purchase_id, purchase_item_id, product_id, product_name,
+         matched_price, matched_date, match_method, status)
+    VALUES (?,?,?,?,?,?,?,'pending')
+    {"" if _USE_SQLITE else "ON CONFLICT (purchase_id, product_id) DO NOTHING"}
+''')
+_SQL_GET_MATCH = _q("SELECT * FROM inventory_matches WHERE id=?")
+_SQL_SET_MATCH_STATUS = _q("UPDATE inventory_matches SET status=? WHERE id=?")
+# Create the amortization unless the product already has one; PostgreSQL
+# returns the new id, SQLite reports it through lastrowid.
+_SQL_INSERT_AMORT = _q(f'''
+    INSERT {"OR IGNORE " if _USE_SQLITE else ""}INTO amortizations
+        (product_id, product_name, purchase_price, purchase_date, notes, product_type)
+    VALUES (?,?,0,?,?,?)
+    {"" if _USE_SQLITE else "ON CONFLICT (product_id) DO NOTHING RETURNING id"}
+''')
+_SQL_GET_AMORT_ID = _q("SELECT id FROM amortizations WHERE product_id=?")
+_SQL_INSERT_AMORT_PURCHASE = _q('''
+    INSERT INTO amortization_purchases
+        (amortization_id, purchase_id, purchase_item_id, cost_override, allocation_note)
+    VALUES (?,?,?,?,?)
+''')
+
 
 # Supplier-level descriptions that never contain product info
 _NOISE_PATTERNS = re.compile(
@@ -39,7 +81,34 @@ def _clean_product(name):
     return name.strip().lower()
 
 
-def _score(pname_clean, iname_clean):
+# Minimum score for a match. Tuned against difflib's SequenceMatcher ratio;
+# other ratios (e.g. RapidFuzz's Indel ratio) score the same pair
+# differently, so swapping the scorer would change which products match.
+_MATCH_THRESHOLD = 0.72
+
+
+# Item-side matchers kept per find_inventory_in_purchases call (see _item_matcher).
+_MATCHER_CACHE = 4096
+
+
+def _item_matcher(iname):
+    """SequenceMatcher with `iname` as seq2. difflib indexes seq2 (b2j) when
+    it is set, so one matcher scores every product name against the same
+    item via set_seq1() without re-indexing the item each time."""
+    return SequenceMatcher(None, '', iname)
+
+
+def _product_tokens(pname_clean):
+    """Product-name tokens (>=4 chars) used by the token-overlap stage of _score."""
+    return [t for t in pname_clean.split() if len(t) >= 4]
+
+
+def _score(pname_clean, iname_clean, tokens=None, matcher=None, cutoff=0.0):
+    """Match score of a cleaned product name against a cleaned item name.
+    Pass `tokens` (from _product_tokens) when scoring one product against many
+    items, and `matcher` (a cached _item_matcher) to reuse item-side indexes.
+    With `cutoff`, a fuzzy score whose upper bound is below it is returned
+    as 0.0 without running the full ratio; scores >= cutoff are exact."""
     if not pname_clean or not iname_clean:
         return 0.0
     # Substring containment (most reliable for partial descriptions)
@@ -48,15 +117,25 @@ def _score(pname_clean, iname_clean):
     if len(iname_clean) >= 6 and iname_clean in pname_clean:
         return 0.93
     # Token overlap: how many product tokens (>=4 chars) appear in item
-    tokens = [t for t in pname_clean.split() if len(t) >= 4]
+    if tokens is None:
+        tokens = _product_tokens(pname_clean)
     if tokens:
         overlap = sum(1 for t in tokens if t in iname_clean) / len(tokens)
         if overlap >= 0.75:
             return 0.85 + overlap * 0.1
     # Full fuzzy ratio trimmed to avoid length bias
-    return SequenceMatcher(
-        None, pname_clean, iname_clean[:len(pname_clean) + 25]
-    ).ratio()
+    trimmed = iname_clean[:len(pname_clean) + 25]
+    if matcher is None:
+        sm = SequenceMatcher(None, pname_clean, trimmed)
+    else:
+        sm = matcher(trimmed)
+        sm.set_seq1(pname_clean)
+    # real_quick_ratio (lengths only) and quick_ratio (character multiset)
+    # are upper bounds of ratio(); most pairs fail one of them, skipping the
+    # quadratic longest-match search.
+    if cutoff and (sm.real_quick_ratio() < cutoff or sm.quick_ratio() < cutoff):
+        return 0.0
+    return sm.ratio()
 
 
 def find_inventory_in_purchases() -> list:
@@ -66,76 +145,83 @@ def find_inventory_in_purchases() -> list:
       1. Exact: purchase_item.product_id == product.id  (Holded-linked)
       2. Substring: cleaned product name contained in cleaned item name
       3. Token overlap: >=75% of product name tokens found in item name
-      4. Fuzzy: SequenceMatcher ratio >= 0.72 on cleaned names
+      4. Fuzzy: SequenceMatcher ratio >= _MATCH_THRESHOLD (0.72) on cleaned names
 
     Skips products already in amortizations or inventory_matches (any status).
     Iterates by product to guarantee one best match per product.
     """
     conn = get_db()
     try:
-        cursor = _cursor(conn)
+        cursor = _dict_cursor(conn)
 
-        cursor.execute("SELECT id, name FROM products")
-        products = [dict(r) for r in cursor.fetchall()]
+        cursor.execute(_SQL_PRODUCTS)
+        products = cursor.fetchall()
 
         # Load ALL purchase items with a real price
-        cursor.execute('''
-            SELECT pit.id AS item_id, pit.purchase_id, pit.product_id,
-                   pit.name AS item_name, pit.price, pit.units,
-                   pi.date, pi.contact_name
-            FROM purchase_items pit
-            JOIN purchase_invoices pi ON pi.id = pit.purchase_id
-            WHERE pit.price IS NOT NULL AND pit.price > 0
-        ''')
-        all_items = [dict(r) for r in cursor.fetchall()]
-
-        # Pre-filter noise and pre-clean names
+        cursor.execute(_SQL_PRICED_PURCHASE_ITEMS)
+
+        # Pre-filter noise and pre-clean names (lowercased once, not per product).
+        # Rows are consumed straight off the cursor so skipped ones are never kept.
         useful_items = []
-        for item in all_items:
+        item_names = []
+        exact_by_pid = {}   # product_id → first item linked to it in Holded
+        for item in cursor:
             raw = item['item_name'] or ''
             if _NOISE_PATTERNS.search(raw):
                 continue
             cleaned = _clean_item(raw)
             if len(cleaned) < 5:
                 continue
-            item['_cleaned'] = cleaned
             useful_items.append(item)
+            item_names.append(cleaned)
+            if item['product_id']:
+                exact_by_pid.setdefault(item['product_id'], item)
 
         # Products already handled — skip them
-        cursor.execute("SELECT product_id FROM amortizations")
-        already_amort = set(r['product_id'] if isinstance(r, dict) else r[0] for r in cursor.fetchall())
-        cursor.execute("SELECT product_id FROM inventory_matches")
-        already_matched = set(r['product_id'] if isinstance(r, dict) else r[0] for r in cursor.fetchall())
+        cursor.execute(_SQL_AMORTIZED_PRODUCTS)
+        already_amort = {r['product_id'] for r in cursor}
+        cursor.execute(_SQL_MATCHED_PRODUCTS)
+        already_matched = {r['product_id'] for r in cursor}
         skip_ids = already_amort | already_matched
 
-        matches = []
+        # Clean each candidate product name (and split its tokens) once
+        candidates = []
         for prod in products:
             if prod['id'] in skip_ids:
                 continue
-
             pname_clean = _clean_product(prod['name'])
             if len(pname_clean) < 4:
                 continue
+            candidates.append((prod, pname_clean, _product_tokens(pname_clean)))
 
+        # Per-call cache: matchers are mutated by set_seq1, so never share them
+        # between concurrent scans. Short items (untrimmed) hit for every product.
+        matcher = lru_cache(maxsize=_MATCHER_CACHE)(_item_matcher)
+
+        matches = []
+        for prod, pname_clean, tokens in candidates:
             best_score = 0.0
             best_item = None
             best_method = None
 
-            for item in useful_items:
-                # Strategy 1: exact Holded product_id link
-                if item['product_id'] and item['product_id'] == prod['id']:
-                    best_score = 1.0
-                    best_item = item
-                    best_method = 'exact_id'
-                    break
-
-                sc = _score(pname_clean, item['_cleaned'])
-                if sc > best_score:
-                    best_score = sc
-                    best_item = item
-                    best_method = f'fuzzy_{int(sc * 100)}pct'
-
-            if best_score >= 0.72 and best_item:
+            # Strategy 1: exact Holded product_id link (always wins)
+            exact = exact_by_pid.get(prod['id'])
+            if exact is not None:
+                best_score = 1.0
+                best_item = exact
+                best_method = 'exact_id'
+            else:
+                for item, iname in zip(useful_items, item_names):
+                    # Only a score above the current best and at the threshold
+                    # can change the outcome, so anything bounded below is skipped.
+                    sc = _score(pname_clean, iname, tokens, matcher,
+                                cutoff=max(best_score, _MATCH_THRESHOLD))
+                    if sc > best_score:
+                        best_score = sc
+                        best_item = item
+                        best_method = f'fuzzy_{int(sc * 100)}pct'
+
+            if best_score >= _MATCH_THRESHOLD and best_item:
                 date_str = ''
                 if best_item['date']:
                     date_str = datetime.fromtimestamp(best_item['date']).strftime('%Y-%m-%d')
@@ -165,52 +251,99 @@ def save_inventory_match(purchase_id, purchase_item_id, product_id,
         vals = (purchase_id, purchase_item_id, product_id, product_name,
                 matched_price, matched_date, match_method)
         if _USE_SQLITE:
-            cursor.execute('''
-                INSERT OR IGNORE INTO inventory_matches
-                    (purchase_id, purchase_item_id, product_id, product_name,
-                     matched_price, matched_date, match_method, status)
-                VALUES (?,?,?,?,?,?,?,'pending')
-            ''', vals)
+            cursor.execute(_SQL_INSERT_MATCH, vals)
             new_id = cursor.lastrowid
         else:
-            cursor.execute('''
-                INSERT INTO inventory_matches
-                    (purchase_id, purchase_item_id, product_id, product_name,
-                     matched_price, matched_date, match_method, status)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,'pending')
-                ON CONFLICT (purchase_id, product_id) DO NOTHING
-                RETURNING id
-            ''', vals)
+            cursor.execute(_SQL_INSERT_MATCH + " RETURNING id", vals)
             row = cursor.fetchone()
             new_id = row['id'] if row else None
         conn.commit()
+        invalidate_pending_matches_cache()
         return new_id
     finally:
         release_db(conn)
 
 
-def get_pending_matches() -> list:
-    """Return all inventory matches awaiting user confirmation."""
-    date_col = ("datetime(pi.date, 'unixepoch') AS invoice_date_full"
-                if _USE_SQLITE else
-                "to_timestamp(pi.date)::text AS invoice_date_full")
+def save_inventory_matches(matches: list) -> int:
+    """Persist a batch of pending matches (as returned by
+    find_inventory_in_purchases) in one transaction. Rows already present for
+    the same (purchase_id, product_id) are skipped. Returns rows inserted."""
+    if not matches:
+        return 0
+    rows = [(m['purchase_id'], m['purchase_item_id'], m['product_id'],
+             m['product_name'], m['matched_price'], m['matched_date'],
+             m['match_method']) for m in matches]
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        cursor.execute(f'''
-            SELECT im.*,
-                   pi.contact_name AS supplier,
-                   {date_col},
-                   pit.name AS item_name_found
-            FROM inventory_matches im
-            JOIN purchase_invoices pi ON pi.id = im.purchase_id
-            LEFT JOIN purchase_items pit ON pit.id = im.purchase_item_id
-            WHERE im.status = 'pending'
-            ORDER BY im.matched_price DESC
-        ''')
-        return [dict(r) for r in cursor.fetchall()]
+        cursor.executemany(_SQL_INSERT_MATCH, rows)
+        inserted = cursor.rowcount
+        conn.commit()
+        invalidate_pending_matches_cache()
+        return inserted
+    finally:
+        release_db(conn)
+
+
+_SQL_PENDING_MATCHES = f'''
+    SELECT im.*,
+           pi.contact_name AS supplier,
+           {"datetime(pi.date, 'unixepoch')" if _USE_SQLITE else "to_timestamp(pi.date)::text"}
+               AS invoice_date_full,
+           pit.name AS item_name_found
+    FROM inventory_matches im
+    JOIN purchase_invoices pi ON pi.id = im.purchase_id
+    LEFT JOIN purchase_items pit ON pit.id = im.purchase_item_id
+    WHERE im.status = 'pending'
+    ORDER BY im.matched_price DESC
+'''
+
+# Cheap fingerprint of inventory_matches, so writes made by another process
+# also invalidate the memoized get_pending_matches() result.
+_SQL_PENDING_FINGERPRINT = '''
+    SELECT COUNT(*) AS n, MAX(id) AS max_id,
+           SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) AS pending
+    FROM inventory_matches
+'''
+
+# Memoized get_pending_matches(): (fingerprint, rows). _pending_rev is bumped
+# by every in-process write so a read that raced with one is not stored.
+_pending_cache = None
+_pending_rev = 0
+_pending_cache_lock = threading.Lock()
+
+
+def invalidate_pending_matches_cache():
+    """Drop the memoized get_pending_matches() result. Call after committing a write."""
+    global _pending_cache, _pending_rev
+    with _pending_cache_lock:
+        _pending_cache = None
+        _pending_rev += 1
+
+
+def get_pending_matches() -> list:
+    """Return all inventory matches awaiting user confirmation.
+    Memoized until a write invalidates it or inventory_matches changes;
+    the row dicts are shared between callers, so treat them as read-only."""
+    global _pending_cache
+    rev = _pending_rev
+    conn = get_db()
+    try:
+        cursor = _dict_cursor(conn)
+        cursor.execute(_SQL_PENDING_FINGERPRINT)
+        fp = cursor.fetchone()
+        key = (fp['n'], fp['max_id'], fp['pending'])
+        cached = _pending_cache
+        if cached is not None and cached[0] == key:
+            return list(cached[1])
+        cursor.execute(_SQL_PENDING_MATCHES)
+        rows = cursor.fetchall()
     finally:
         release_db(conn)
+    with _pending_cache_lock:
+        if rev == _pending_rev:
+            _pending_cache = (key, rows)
+    return list(rows)
 
 
 def confirm_inventory_match(match_id: int, confirmed: bool, custom_price=None,
@@ -222,62 +355,57 @@ def confirm_inventory_match(match_id: int, confirmed: bool, custom_price=None,
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        cursor.execute(_q("SELECT * FROM inventory_matches WHERE id=?"), (match_id,))
+        cursor.execute(_SQL_GET_MATCH, (match_id,))
         match = cursor.fetchone()
         if not match:
             return {"ok": False, "error": "Match not found"}
 
         if not confirmed:
-            cursor.execute(_q("UPDATE inventory_matches SET status='rejected' WHERE id=?"), (match_id,))
+            cursor.execute(_SQL_SET_MATCH_STATUS, ('rejected', match_id))
             conn.commit()
+            invalidate_pending_matches_cache()
             return {"ok": True, "action": "rejected"}
 
         # Mark match as confirmed
-        cursor.execute(_q("UPDATE inventory_matches SET status='confirmed' WHERE id=?"), (match_id,))
+        cursor.execute(_SQL_SET_MATCH_STATUS, ('confirmed', match_id))
 
         final_price = float(custom_price) if custom_price and float(custom_price) > 0 else match['matched_price']
         ptype = product_type or 'alquiler'
 
-        # Upsert amortization — INSERT OR IGNORE so existing products are not overwritten
+        # Upsert amortization — insert-or-ignore so existing products are not
+        # overwritten. A new row reports its id directly (lastrowid/RETURNING).
         amort_vals = (match['product_id'], match['product_name'],
                       match['matched_date'],
                       f"Vinculado desde inventory_matches via {match['match_method']}",
                       ptype)
+        cursor.execute(_SQL_INSERT_AMORT, amort_vals)
         if _USE_SQLITE:
-            cursor.execute('''
-                INSERT OR IGNORE INTO amortizations
-                    (product_id, product_name, purchase_price, purchase_date, notes, product_type)
-                VALUES (?,?,0,?,?,?)
-            ''', amort_vals)
+            amort_id = cursor.lastrowid if cursor.rowcount > 0 else None
         else:
-            cursor.execute('''
-                INSERT INTO amortizations
-                    (product_id, product_name, purchase_price, purchase_date, notes, product_type)
-                VALUES (%s,%s,0,%s,%s,%s)
-                ON CONFLICT (product_id) DO NOTHING
-            ''', amort_vals)
-
-        # Retrieve the amortization id (whether just created or pre-existing)
-        cursor.execute(_q("SELECT id FROM amortizations WHERE product_id=?"), (match['product_id'],))
-        amort_row = cursor.fetchone()
-        if not amort_row:
-            conn.rollback()
-            return {"ok": False, "error": "Could not create or find amortization"}
-        amort_id = amort_row['id'] if isinstance(amort_row, dict) else amort_row[0]
+            row = cursor.fetchone()
+            amort_id = row['id'] if row else None
+        added = amort_id is not None
+
+        if not added:
+            # Product already amortized: link the purchase to the existing entry
+            cursor.execute(_SQL_GET_AMORT_ID, (match['product_id'],))
+            amort_row = cursor.fetchone()
+            if not amort_row:
+                conn.rollback()
+                return {"ok": False, "error": "Could not create or find amortization"}
+            amort_id = amort_row['id']
 
         # Add the purchase link
         note = allocation_note or f"Auto desde match #{match_id} ({match['match_method']})"
-        cursor.execute(_q('''
-            INSERT INTO amortization_purchases
-                (amortization_id, purchase_id, purchase_item_id, cost_override, allocation_note)
-            VALUES (?,?,?,?,?)
-        '''), (amort_id, match['purchase_id'], match['purchase_item_id'], final_price, note))
+        cursor.execute(_SQL_INSERT_AMORT_PURCHASE, (amort_id, match['purchase_id'], match['purchase_item_id'], final_price, note))
 
         # Recalculate purchase_price
         _recalc_purchase_price(cursor, amort_id)
 
         conn.commit()
+        invalidate_pending_matches_cache()
         return {"ok": True, "action": "confirmed",
-                "amortization_id": amort_id, "price_used": final_price}
+                "amortization_id": amort_id, "price_used": final_price,
+                "added_to_amortizations": added}
     finally:
         release_db(conn)
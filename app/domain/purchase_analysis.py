@@ -7,8 +7,15 @@ Add new rules to CATEGORY_RULES when you create new supplier folders.
 """
 
 import logging
+from collections import defaultdict
 
-from app.db.connection import get_db, release_db, _cursor, _q, _num, _row_val, _fetch_one_val, _USE_SQLITE
+from app.db.connection import get_db, release_db, _cursor, _dict_cursor, _q, _num, _row_val, _USE_SQLITE
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
 
 logger = logging.getLogger(__name__)
 
@@ -92,46 +99,83 @@ CATEGORY_RULES = [
 ]
 
 
+def _build_keyword_automaton():
+    """Aho-Corasick automaton over every CATEGORY_RULES keyword.
+    Each keyword maps to its (rule index, keyword index) so the scan can pick
+    the same winner as the ordered rule loop: first rule, then first keyword."""
+    automaton = ahocorasick.Automaton()
+    for rule_idx, (_, _, keywords) in enumerate(CATEGORY_RULES):
+        for kw_idx, kw in enumerate(keywords):
+            if kw not in automaton:
+                automaton.add_word(kw, (rule_idx, kw_idx, kw))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if HAS_AHOCORASICK else None
+
+
+def _rule_match(category, subcategory, matched_kw):
+    return {
+        "category": category,
+        "subcategory": subcategory,
+        "confidence": "high",
+        "method": "rules",
+        "reasoning": f"Keyword match: '{matched_kw}'"
+    }
+
+
 def categorize_by_rules(desc: str, contact_name: str, item_names: list):
     """Try to categorize a purchase invoice using keyword rules.
-    Returns dict with category/subcategory/confidence='high' or None if no match."""
+    Returns dict with category/subcategory/confidence='high' or None if no match.
+    Rules are tried in CATEGORY_RULES order; with pyahocorasick installed the
+    text is scanned once for all keywords instead of once per keyword."""
     text = " ".join(filter(None, [desc, contact_name] + item_names)).lower()
+    if _KEYWORD_AUTOMATON is not None:
+        best = min((hit for _, hit in _KEYWORD_AUTOMATON.iter(text)), default=None)
+        if best is None:
+            return None
+        category, subcategory, _ = CATEGORY_RULES[best[0]]
+        return _rule_match(category, subcategory, best[2])
     for category, subcategory, keywords in CATEGORY_RULES:
-        if any(kw in text for kw in keywords):
-            matched_kw = next(kw for kw in keywords if kw in text)
-            return {
-                "category": category,
-                "subcategory": subcategory,
-                "confidence": "high",
-                "method": "rules",
-                "reasoning": f"Keyword match: '{matched_kw}'"
-            }
+        for kw in keywords:
+            if kw in text:
+                return _rule_match(category, subcategory, kw)
     return None
 
 
 def get_unanalyzed_purchases(limit: int = 10) -> list:
     """Return up to `limit` purchase invoices not yet in purchase_analysis."""
-    agg = "GROUP_CONCAT(pit.name, '||')" if _USE_SQLITE else "STRING_AGG(pit.name, '||')"
     conn = get_db()
     try:
-        cursor = _cursor(conn)
-        cursor.execute(_q(f'''
-            SELECT pi.id, pi.contact_name, pi."desc", pi.date, pi.amount,
-                   {agg} AS item_names
+        cursor = _dict_cursor(conn)
+        # Anti-join via NOT EXISTS (served by purchase_analysis' UNIQUE index)
+        # lets idx_purchases_date drive a reverse scan that stops after `limit`
+        # rows instead of sorting every unanalyzed purchase.
+        cursor.execute(_q('''
+            SELECT pi.id, pi.contact_name, pi."desc", pi.date, pi.amount
             FROM purchase_invoices pi
-            LEFT JOIN purchase_items pit ON pit.purchase_id = pi.id
-            LEFT JOIN purchase_analysis pa ON pa.purchase_id = pi.id
-            WHERE pa.id IS NULL
-            GROUP BY pi.id, pi.contact_name, pi."desc", pi.date, pi.amount
+            WHERE NOT EXISTS (
+                SELECT 1 FROM purchase_analysis pa WHERE pa.purchase_id = pi.id
+            )
             ORDER BY pi.date DESC
             LIMIT ?
         '''), (limit,))
-        rows = cursor.fetchall()
-        result = []
-        for row in rows:
-            d = dict(row)
-            d['item_names'] = [n for n in (d.get('item_names') or '').split('||') if n]
-            result.append(d)
+        result = cursor.fetchall()
+        if not result:
+            return result
+        # Item names for just those purchases, via idx_pur_items_purchase,
+        # bucketed here rather than concatenated in SQL and split again.
+        names = defaultdict(list)
+        ids = [d['id'] for d in result]
+        cursor.execute(_q(
+            f"SELECT purchase_id, name FROM purchase_items "
+            f"WHERE purchase_id IN ({','.join('?' * len(ids))}) ORDER BY id"), ids)
+        for item in cursor.fetchall():
+            if item['name']:
+                names[item['purchase_id']].append(item['name'])
+        for d in result:
+            d['item_names'] = names.get(d['id'], [])
         return result
     finally:
         release_db(conn)
@@ -199,20 +243,25 @@ def get_analysis_stats() -> dict:
     """Summary of analysis progress."""
     conn = get_db()
     try:
-        cursor = _cursor(conn)
-        cursor.execute("SELECT COUNT(*) AS total FROM purchase_invoices")
-        total = _fetch_one_val(cursor, "total") or 0
-        cursor.execute("SELECT COUNT(*) AS analyzed FROM purchase_analysis")
-        analyzed = _fetch_one_val(cursor, "analyzed") or 0
+        cursor = _dict_cursor(conn)
+        # Scalar counters in one round-trip; purchase_analysis is read once
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM purchase_invoices) AS total,
+                   COUNT(*)                                 AS analyzed,
+                   MAX(analyzed_at)                         AS last_run
+            FROM purchase_analysis
+        ''')
+        counts = cursor.fetchone()
+        total = counts["total"] or 0
+        analyzed = counts["analyzed"] or 0
+        last_run = counts["last_run"]
         cursor.execute('''
             SELECT category, COUNT(*) AS count, SUM(pi.amount) AS total_amount
             FROM purchase_analysis pa
             JOIN purchase_invoices pi ON pi.id = pa.purchase_id
             GROUP BY category ORDER BY total_amount DESC
         ''')
-        by_category = [dict(r) for r in cursor.fetchall()]
-        cursor.execute("SELECT MAX(analyzed_at) AS last_run FROM purchase_analysis")
-        last_run = _fetch_one_val(cursor, "last_run")
+        by_category = cursor.fetchall()
         return {
             "total": total,
             "analyzed": analyzed,
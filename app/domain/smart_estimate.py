@@ -31,6 +31,7 @@ from app.holded.client import (
     SHOOTING_DATES_PRODUCT_ID,
 )
 from app.db.connection import HEADERS, BASE_URL  # [IMPROVED: finding #C5]
+from app.db.settings import ensure_config
 
 logger = logging.getLogger(__name__)
 
@@ -177,6 +178,7 @@ def create_smart_estimate(input_data: dict) -> dict:
     pdf_base64 = ""
     if not is_safe_mode:
         try:
+            ensure_config()
             pdf_url = f"{BASE_URL}/invoicing/v1/documents/estimate/{estimate_id}/pdf"
             pdf_resp = _requests.get(pdf_url, headers=HEADERS, timeout=30)
             if pdf_resp.status_code == 200 and pdf_resp.content:
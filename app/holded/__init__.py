@@ -33,6 +33,7 @@ from app.holded.sync import (
     sync_contacts,
     sync_projects,
     sync_payments,
+    prefetched_sync_steps,
 )
 from app.holded.sync_single import (
     sync_single_document,
@@ -6,14 +6,39 @@ and Holded-specific constants (special product IDs used for project tracking).
 Extracted from connector.py during Fase 5a refactor.
 """
 import os
+import re
 import json
 import time
+import random
 import logging
+import threading
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from app.db.connection import HEADERS, BASE_URL, SAFE_MODE
+from app.db.settings import ensure_config
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 logger = logging.getLogger(__name__)
 
+# ── Shared HTTP session ──────────────────────────────────────────────────────
+# One keep-alive connection pool for every Holded call, sized for the
+# concurrent page fetches in fetch_data. Retries stay in the callers.
+_FETCH_WORKERS = 4
+_SESSION = requests.Session()
+# Process-wide cap on list-page GETs in flight. Page fetches can run from
+# several pools at once (iter_pages inside a prefetched sync step), so the
+# limit lives here rather than in any one executor; it keeps a full sync
+# within Holded's rate limit however many steps are fetching.
+_HTTP_SLOTS = threading.BoundedSemaphore(_FETCH_WORKERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 # ── Holded-specific constants (used by sync functions) ───────────────────────
 PROYECTO_PRODUCT_ID = os.getenv("HOLDED_PROYECTO_PRODUCT_ID", "69b2b35f75ae381d8f05c133")
 PROYECTO_PRODUCT_NAME = "proyect ref:"
@@ -21,6 +46,11 @@ SHOOTING_DATES_PRODUCT_ID = os.getenv("HOLDED_SHOOTING_DATES_PRODUCT_ID", "69b2c
 SHOOTING_DATES_PRODUCT_NAME = "shooting dates:"
 
 
+# Retention tax keys look like "s_ret_15" / "s_ret_7.5": the rate ends the key.
+# Surrounding whitespace is tolerated, as float() did before the regex.
+_RET_RE = re.compile(r'_ret_\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
 def extract_ret(prod):
     r = prod.get('retention')
     if r is not None and r != 0:
@@ -29,63 +59,145 @@ def extract_ret(prod):
     if isinstance(taxes, str): taxes = taxes.split(',')
     if isinstance(taxes, list):
         for t in taxes:
-            st = str(t)
+            st = t if isinstance(t, str) else str(t)
             if '_ret_' in st:
-                try: return float(st.split('_ret_')[-1])
-                except (ValueError, IndexError): pass
+                m = _RET_RE.search(st)
+                if m:
+                    return float(m.group(1))
     return 0
 
-def fetch_data(endpoint, params=None):
-    if params is None: params = {}
-    all_data = []
-    page = 1
-    max_retries = 5
-    retry_delay = 5
+# Retry waits use decorrelated jitter: each wait is drawn between the base
+# delay and 3× the previous wait, capped, so concurrent page workers hitting
+# the same 429 do not retry in lockstep. A numeric Retry-After wins, but is
+# capped too: a worker (or a user-facing read) never sleeps longer than that.
+_BACKOFF_CAP = 60
 
-    if 'limit' not in params:
-        params['limit'] = 500
 
-    while True:
-        params['page'] = page
-        url = f"{BASE_URL}{endpoint}"
-        logger.info(f"Fetching {endpoint} (Page {page}, Limit {params['limit']})...")
+def _backoff(response, base, prev):
+    """Seconds to sleep before retrying. `response` may be None (network error)."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "").strip()
+        if retry_after.isdigit():
+            return min(_BACKOFF_CAP, int(retry_after))
+    return min(_BACKOFF_CAP, random.uniform(base, max(base, prev * 3)))
 
-        current_data = None
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(url, headers=HEADERS, params=params, timeout=40)
-
-                if response.status_code == 200:
-                    current_data = response.json()
-                    break
-                elif response.status_code == 429:
-                    logger.warning(f"Rate limit hit (429) for {endpoint}. Waiting {retry_delay}s... (Attempt {attempt+1})")
-                    time.sleep(retry_delay * (attempt + 1))
+
+def _parse_json(response):
+    """Decode a JSON response body, with orjson when installed."""
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass  # let requests report it (handles odd encodings too)
+    return response.json()
+
+
+def _fetch_page(endpoint, params, page, max_retries=5, retry_delay=5, stop=None):
+    """GET one page of a list endpoint with retry on 429/5xx. Returns parsed JSON or None.
+
+    Holds one of the _HTTP_SLOTS for each request (never while sleeping).
+    If `stop` is set by the time a slot frees up, returns None unrequested."""
+    params = dict(params, page=page)
+    ensure_config()
+    url = f"{BASE_URL}{endpoint}"
+    logger.info(f"Fetching {endpoint} (Page {page}, Limit {params['limit']})...")
+    wait = 0
+    for attempt in range(max_retries):
+        try:
+            with _HTTP_SLOTS:
+                if stop is not None and stop.is_set():
+                    return None
+                response = _SESSION.get(url, headers=HEADERS, params=params, timeout=40)
+
+            if response.status_code == 200:
+                return _parse_json(response)
+            elif response.status_code == 429:
+                wait = _backoff(response, retry_delay, wait)
+                logger.warning(f"Rate limit hit (429) for {endpoint}. Waiting {wait:.1f}s... (Attempt {attempt+1})")
+                time.sleep(wait)
+                continue
+            else:
+                logger.error(f"Error fetching {endpoint} (Page {page}): {response.status_code} - {response.text}")
+                if response.status_code >= 500:
+                    wait = _backoff(response, 2, wait)
+                    time.sleep(wait)
                     continue
                 else:
-                    logger.error(f"Error fetching {endpoint} (Page {page}): {response.status_code} - {response.text}")
-                    if response.status_code >= 500:
-                        time.sleep(2 * (attempt + 1))
-                        continue
-                    else:
-                        break
-            except Exception as e:
-                logger.error(f"Exception fetching {endpoint} (Page {page}, Attempt {attempt+1}): {e}")
-                time.sleep(2 * (attempt + 1))
-
-        if current_data is None:
-            logger.warning(f"Failed to fetch {endpoint} page {page} after retries. Returning partial data.")
-            break
-
-        if isinstance(current_data, list):
-            all_data.extend(current_data)
-            logger.info(f"Received {len(current_data)} items. Total: {len(all_data)}")
-            if len(current_data) < params['limit']:
-                break
-            page += 1
-        else:
-            return current_data
+                    return None
+        except Exception as e:
+            logger.error(f"Exception fetching {endpoint} (Page {page}, Attempt {attempt+1}): {e}")
+            wait = _backoff(None, 2, wait)
+            time.sleep(wait)
+    return None
 
+
+def iter_pages(endpoint, params=None):
+    """Yield the pages of a Holded list endpoint as they arrive.
+
+    Page 1 is fetched alone; if it is full, up to _FETCH_WORKERS following
+    pages are kept in flight over the shared keep-alive session while the
+    caller works on the pages already yielded. Each consumed full page
+    schedules one more; once a page comes back short nothing further is
+    requested and queued pages are dropped unfetched. Pages come out in
+    order. A page that still fails after retries ends the iteration with the
+    pages yielded so far. A non-list page 1 (single-object endpoints) is
+    yielded as is."""
+    params = dict(params or {})
+    params.setdefault('limit', 500)
+    limit = params['limit']
+
+    current_data = _fetch_page(endpoint, params, 1)
+    if current_data is None:
+        logger.warning(f"Failed to fetch {endpoint} page 1 after retries. Returning partial data.")
+        return
+    if isinstance(current_data, list):
+        logger.info(f"Received {len(current_data)} items. Total: {len(current_data)}")
+    yield current_data
+    if not isinstance(current_data, list) or len(current_data) < limit:
+        return
+
+    total = len(current_data)
+    next_page = 2
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=_FETCH_WORKERS) as pool:
+        pending = deque()
+
+        def schedule():
+            nonlocal next_page
+            pending.append((next_page, pool.submit(_fetch_page, endpoint, params, next_page, stop=stop)))
+            next_page += 1
+
+        for _ in range(_FETCH_WORKERS):
+            schedule()
+        try:
+            while pending:
+                page, future = pending.popleft()
+                current_data = future.result()
+                if current_data is None:
+                    logger.warning(f"Failed to fetch {endpoint} page {page} after retries. Returning partial data.")
+                    return
+                if not isinstance(current_data, list):
+                    return
+                total += len(current_data)
+                logger.info(f"Received {len(current_data)} items. Total: {total}")
+                yield current_data
+                if len(current_data) < limit:
+                    return
+                schedule()
+        finally:
+            # Short/failed page or caller gone: skip everything still queued.
+            stop.set()
+            for _, future in pending:
+                future.cancel()
+
+
+def fetch_data(endpoint, params=None):
+    """GET every page of a Holded list endpoint (see iter_pages) as one list."""
+    all_data = []
+    for current_data in iter_pages(endpoint, params):
+        if not isinstance(current_data, list):
+            return current_data
+        all_data.extend(current_data)
     return all_data
 
 
@@ -93,12 +205,13 @@ def post_data(endpoint, payload):
     """POST to Holded API. Returns dict with 'error' key on failure."""
     if SAFE_MODE:
         logger.info(f"[SAFE MODE] Intercepted POST to {endpoint}")
-        logger.debug(f"[SAFE MODE] Payload: {payload}")
+        logger.debug("[SAFE MODE] Payload: %s", payload)  # formatted only if DEBUG is on
         return {"status": 1, "id": "SAFE_MODE_ID_TEST", "info": "Dry run successful", "dry_run": True}
 
+    ensure_config()
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+        response = _SESSION.post(url, headers=HEADERS, json=payload, timeout=30)
         if response.status_code in (200, 201):
             return response.json()
         else:
@@ -115,12 +228,13 @@ def put_data(endpoint, payload):
     """PUT to Holded API. Returns dict with 'error' key on failure."""
     if SAFE_MODE:
         logger.info(f"[SAFE MODE] Intercepted PUT to {endpoint}")
-        logger.debug(f"[SAFE MODE] Payload: {payload}")
+        logger.debug("[SAFE MODE] Payload: %s", payload)  # formatted only if DEBUG is on
         return {"status": 1, "info": "Dry run successful", "dry_run": True}
 
+    ensure_config()
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.put(url, headers=HEADERS, json=payload, timeout=30)
+        response = _SESSION.put(url, headers=HEADERS, json=payload, timeout=30)
         if response.status_code in (200, 201):
             return response.json()
         else:
@@ -158,15 +272,17 @@ def post_multipart(endpoint, file_bytes, filename, content_type, max_retries=3):
     if len(file_bytes) > max_size:
         return {"error": True, "status_code": 413, "detail": f"File too large ({len(file_bytes)} bytes, max {max_size})"}
 
+    ensure_config()
     url = f"{BASE_URL}{endpoint}"
     # Only send API key header — NO Content-Type (requests sets multipart boundary)
     headers_key_only = {"key": HEADERS.get("key", "")}
     retry_delay = 2
+    wait = 0
 
     for attempt in range(max_retries):
         try:
             files = {"file": (filename, file_bytes, content_type)}
-            response = requests.post(url, headers=headers_key_only, files=files, timeout=60)
+            response = _SESSION.post(url, headers=headers_key_only, files=files, timeout=60)
 
             if response.status_code in (200, 201):
                 # Holded returns HTML for unknown endpoints — verify it's JSON
@@ -178,12 +294,12 @@ def post_multipart(endpoint, file_bytes, filename, content_type, max_retries=3):
                     return {"error": True, "status_code": response.status_code,
                             "detail": "Holded returned HTML instead of JSON — endpoint may not exist"}
             elif response.status_code == 429:
-                wait = retry_delay * (attempt + 1)
-                logger.warning(f"Rate limit (429) uploading to {endpoint}, waiting {wait}s (attempt {attempt+1})")
+                wait = _backoff(response, retry_delay, wait)
+                logger.warning(f"Rate limit (429) uploading to {endpoint}, waiting {wait:.1f}s (attempt {attempt+1})")
                 time.sleep(wait)
                 continue
             elif response.status_code >= 500:
-                wait = retry_delay * (attempt + 1)
+                wait = _backoff(response, retry_delay, wait)
                 logger.warning(f"Server error ({response.status_code}) uploading to {endpoint}, retry {attempt+1}")
                 time.sleep(wait)
                 continue
@@ -208,9 +324,10 @@ def delete_data(endpoint):
         logger.info(f"[SAFE MODE] Intercepted DELETE to {endpoint}")
         return {"status": 1, "info": "Dry run successful (delete)", "dry_run": True}
 
+    ensure_config()
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.delete(url, headers=HEADERS, timeout=30)
+        response = _SESSION.delete(url, headers=HEADERS, timeout=30)
         if response.status_code in (200, 201, 204):
             try:
                 return response.json()
@@ -251,8 +368,9 @@ def _extract_shooting_dates(products):
 
 def holded_put(endpoint, data):
     """PUT request to Holded API."""
+    ensure_config()
     try:
-        response = requests.put(f"{BASE_URL}{endpoint}", headers=HEADERS, json=data)
+        response = _SESSION.put(f"{BASE_URL}{endpoint}", headers=HEADERS, json=data)
         if response.status_code == 200:
             return response.json()
         logger.error(f"Error putting to {endpoint}: {response.status_code} - {response.text[:200]}")
@@ -10,10 +10,19 @@ Extracted from connector.py during Fase 5a refactor.
 import json
 import time
 import logging
+import threading
 import requests
-from app.db.connection import get_db, release_db, _cursor, _q, _num, _row_val, _fetch_one_val, _USE_SQLITE
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from itertools import chain
+import app.db.connection as _conn
+from app.db.connection import get_db, release_db, _cursor, _q, _num, _insert_many, _row_val, _fetch_one_val, _USE_SQLITE
+from app.domain.amortization import refresh_product_revenue, invalidate_amortization_cache
+from app.domain.inventory_matching import invalidate_pending_matches_cache
 from app.holded.client import (
     fetch_data,
+    iter_pages,
     extract_ret,
     _extract_project_code,
     _extract_shooting_dates,
@@ -22,149 +31,293 @@ from app.holded.client import (
     SHOOTING_DATES_PRODUCT_ID,
     SHOOTING_DATES_PRODUCT_NAME,
 )
-from app.holded.upsert import _upsert_single_document, _upsert_single_contact, _upsert_single_product
+from app.holded.upsert import (
+    _upsert_single_document, _upsert_single_contact, _upsert_single_product,
+    _account_names, _upsert_sql, _PH,
+)
 
 logger = logging.getLogger(__name__)
 
+# Document ids per "DELETE ... WHERE fk IN (...)" statement; stays well under
+# SQLite's bound-parameter limit (999 on older builds).
+_DELETE_CHUNK = 500
+
+# Item rows above which the items table's secondary indexes are dropped for
+# the insert and rebuilt afterwards (a sort + bulk load beats one B-tree
+# insert per row). Below it — the usual incremental re-sync — rebuilding
+# whole indexes would cost more than maintaining them. SQLite only: on
+# PostgreSQL, DROP INDEX inside the sync transaction would hold an ACCESS
+# EXCLUSIVE lock on the items table, blocking every reader until commit.
+_INDEX_REBUILD_MIN_ROWS = 20000
+
+# ── Write statements, built once at import ───────────────────────────────────
+# _USE_SQLITE is fixed at import, so every statement is specialized to the
+# dialect here. The sync loops collect rows and hand each constant to
+# executemany(), which compiles the statement once for the whole batch.
+_DOC_COLS = ('id', 'contact_id', 'contact_name', '"desc"', 'date', 'amount', 'status',
+             'doc_number', 'tags', 'notes', 'project_code', 'shooting_dates_raw')
+_INVOICE_COLS = ('id', 'contact_id', 'contact_name', '"desc"', 'date', 'amount', 'status',
+                 'payments_pending', 'payments_total', 'due_date', 'doc_number', 'tags', 'notes',
+                 'project_code', 'shooting_dates_raw')
+_DOC_TABLE_COLS = {
+    'invoices':          _INVOICE_COLS,
+    'purchase_invoices': _DOC_COLS,
+    'estimates':         _DOC_COLS,
+}
+_SQL_UPSERT_DOC = {
+    'invoices':          _upsert_sql('invoices', _INVOICE_COLS),
+    'purchase_invoices': _upsert_sql('purchase_invoices', _DOC_COLS),
+    'estimates':         _upsert_sql('estimates', _DOC_COLS),
+}
+_ITEM_COLS = ('product_id', 'name', 'sku', 'units', 'price', 'subtotal',
+              'discount', 'tax', 'retention', 'account', 'project_id', 'kind', '"desc"')
+_ITEMS_INSERT_HEAD = {
+    items_table: f'''INSERT INTO {items_table}
+        ({fk_column}, product_id, name, sku, units, price, subtotal,
+         discount, tax, retention, account, project_id, kind, "desc")'''
+    for items_table, fk_column in (('invoice_items', 'invoice_id'),
+                                   ('purchase_items', 'purchase_id'),
+                                   ('estimate_items', 'estimate_id'))
+}
+_SQL_UPSERT_ACCOUNT = _upsert_sql('ledger_accounts', ('id', 'name', 'num'))
+_SQL_UPSERT_PRODUCT = _upsert_sql('products', ('id', 'name', '"desc"', 'price', 'stock', 'sku', 'kind'))
+_SQL_INSERT_PACK_COMPONENT = _q("INSERT INTO pack_components (pack_id, component_id, quantity) VALUES (?,?,?)")
+_SQL_UPSERT_CONTACT = _upsert_sql('contacts', (
+    'id', 'name', 'email', 'type', 'code', 'vat', 'phone', 'mobile',
+    'country', 'address', 'city', 'province', 'postal_code', 'trade_name', 'discount'))
+_SQL_UPSERT_PROJECT = _upsert_sql('projects', ('id', 'name', '"desc"', 'status', 'customer_id', 'budget'))
+_SQL_UPSERT_PAYMENT = _upsert_sql('payments', ('id', 'document_id', 'amount', 'date', 'method', 'type'))
+
+# Holded endpoints for the non-document entities.
+_ENDPOINTS = {
+    'accounts': "/accounting/v1/chartofaccounts",
+    'products': "/invoicing/v1/products",
+    'contacts': "/invoicing/v1/contacts",
+    'projects': "/projects/v1/projects",
+    'payments': "/invoicing/v1/payments",
+}
+
+
+def _stored_row(row):
+    """DB row → tuple comparable with the rows sync builds (NUMERIC → float on PG)."""
+    if _USE_SQLITE:
+        return tuple(row)
+    return tuple(float(v) if isinstance(v, Decimal) else v for v in row)
+
+
+def _stored_documents(conn, table, items_table, fk_column):
+    """Current document rows and per-document item rows, in sync's row layout."""
+    cur = conn.cursor()
+    cur.execute(f'SELECT {", ".join(_DOC_TABLE_COLS[table])} FROM {table}')
+    docs = {row[0]: row for row in map(_stored_row, cur.fetchall())}
+    cur.execute(f'SELECT {fk_column}, {", ".join(_ITEM_COLS)} FROM {items_table} ORDER BY id')
+    items = {}
+    for row in map(_stored_row, cur.fetchall()):
+        items.setdefault(row[0], []).append(row)
+    return docs, items
+
+
+def _secondary_indexes(cursor, table):
+    """(name, CREATE statement) of `table`'s non-unique indexes (SQLite)."""
+    cursor.execute("SELECT name, sql FROM sqlite_master "
+                   "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))
+    return [(r[0], r[1]) for r in cursor.fetchall() if 'UNIQUE' not in r[1].upper()]
+
+
+# Full ledger account map used by the bulk document syncs: (DB_NAME, acc_map).
+# Only sync_accounts writes ledger_accounts, and it drops this after its
+# commit; the generation check keeps a load that raced with it from being kept.
+_acc_map_cache = None
+_acc_map_gen = 0
+_acc_map_lock = threading.Lock()
+
+
+def _invalidate_account_names():
+    global _acc_map_cache, _acc_map_gen
+    with _acc_map_lock:
+        _acc_map_cache = None
+        _acc_map_gen += 1
+
+
+def _bulk_account_names():
+    """Every ledger account id → display name (see _account_names), read once
+    and shared by the invoice/purchase/estimate syncs until accounts change."""
+    global _acc_map_cache
+    cached = _acc_map_cache
+    if cached is not None and cached[0] == _conn.DB_NAME:
+        return cached[1]
+    gen = _acc_map_gen
+    conn = get_db()
+    try:
+        acc_map = _account_names(_cursor(conn))
+    finally:
+        release_db(conn)
+    with _acc_map_lock:
+        if gen == _acc_map_gen:
+            _acc_map_cache = (_conn.DB_NAME, acc_map)
+    return acc_map
+
 
-def sync_documents(doc_type, table, items_table, fk_column):
-    logger.info(f"Syncing {doc_type}s (Historical)...")
+def _document_pages(doc_type):
     params = {"starttmp": 1262304000, "endtmp": int(time.time())}
-    data = fetch_data(f"/invoicing/v1/documents/{doc_type}", params=params)
+    return iter_pages(f"/invoicing/v1/documents/{doc_type}", params=params)
+
+
+def _fetch_documents(doc_type):
+    return [doc for page in _document_pages(doc_type) for doc in page]
+
+
+def sync_documents(doc_type, table, items_table, fk_column, data=None):
+    """Write every `doc_type` document to `table`/`items_table`.
+
+    `data` is the already-fetched document list (see prefetched_sync_steps);
+    when omitted, pages are fetched here and turned into rows as they
+    arrive, while the next pages are still downloading. Either way every
+    row is built before the write transaction opens, so the SQLite write
+    lock is never held across the network.
+    """
+    logger.info(f"Syncing {doc_type}s (Historical)...")
+    if data is None:
+        data = chain.from_iterable(_document_pages(doc_type))
+
+    acc_name = _bulk_account_names().get   # account id → display name
 
     _changed_project_codes = set()
+    # Rows are collected per document and written with executemany after
+    # the loop. Keyed by doc id so a document repeated across API pages is
+    # written once (last copy wins).
+    doc_rows = {}    # doc_id → document row
+    item_rows = {}   # doc_id → [item row, ...]
+    jobs = []        # (project_code, doc_data) for ensure_job, in document order
+
+    for item in data:
+        doc_id = item.get('id')
+        tags   = json.dumps(item.get('tags') or [])
+        notes  = item.get('notes') or ''
+
+        # --- Holded API status derivation (invoices only) --------------------
+        # Holded API status field is unreliable for invoices:
+        #   API 0 = draft (but also returned for approved invoices — buggy)
+        #   API 1 = approved (but doesn't distinguish paid/unpaid/overdue)
+        #   API 3 = cancelled (Anulado)
+        # We derive the real status from multiple fields:
+        #   0 = draft, 1 = pending, 3 = paid, 4 = overdue, 5 = cancelled
+        # Estimates/purchases use different status codes — pass through as-is.
+        api_status = item.get('status')
+        if table == 'invoices':
+            pending = float(_num(item.get('paymentsPending', 0)) or 0)
+            due_ts  = item.get('dueDate')
+
+            if api_status == 3:
+                raw_status = 5  # cancelled (Anulado)
+            elif api_status == 0 and not item.get('approvedAt'):
+                raw_status = 0  # truly draft
+            else:
+                # Approved invoice — derive payment status
+                if abs(pending) < 0.01:
+                    raw_status = 3  # paid (Pagado)
+                elif due_ts and isinstance(due_ts, (int, float)) and due_ts < time.time():
+                    raw_status = 4  # overdue (Vencido)
+                else:
+                    raw_status = 1  # pending (Pendiente)
+        else:
+            raw_status = api_status
+        # -------------------------------------------------------------------
+
+        # Extract project code + shooting dates from line items
+        project_code = _extract_project_code(item.get('products'))
+        shooting_raw = _extract_shooting_dates(item.get('products'))
+
+        if table == 'invoices':
+            doc_rows[doc_id] = (
+                doc_id, item.get('contact'), item.get('contactName'), item.get('desc'),
+                item.get('date'), _num(item.get('total')), raw_status,
+                _num(item.get('paymentsPending', 0)), _num(item.get('paymentsTotal', 0)),
+                item.get('dueDate'), item.get('docNumber'), tags, notes,
+                project_code, shooting_raw)
+        else:
+            doc_rows[doc_id] = (
+                doc_id, item.get('contact'), item.get('contactName'), item.get('desc'),
+                item.get('date'), _num(item.get('total')), raw_status,
+                item.get('docNumber'), tags, notes, project_code, shooting_raw)
+
+        # Items: delete + re-insert (simpler than upsert for SERIAL-keyed rows)
+        rows_for_doc = []
+        append = rows_for_doc.append
+        for prod in item.get('products', []):
+            get = prod.get
+            retention = extract_ret(prod)
+            acc_id = get('accountCode') or get('accountName') or get('account')
+            account = acc_name(acc_id, acc_id)
+            append(
+                (doc_id, get('productId'), get('name'), get('sku'),
+                 _num(get('units')), _num(get('price')), _num(get('subtotal')),
+                 _num(get('discount')), _num(get('tax')), _num(retention), account,
+                 get('projectid'), get('kind'), get('desc')))
+        item_rows[doc_id] = rows_for_doc
+
+        # If this doc has a project code, ensure job exists (written below)
+        if project_code:
+            doc_data = {
+                "client_id": item.get('contact'),
+                "client_name": item.get('contactName'),
+                "shooting_dates_raw": shooting_raw,
+                "estimate_id": doc_id if table == 'estimates' else None,
+                "estimate_number": item.get('docNumber') if table == 'estimates' else None,
+                "invoice_id": doc_id if table == 'invoices' else None,
+                "invoice_number": item.get('docNumber') if table == 'invoices' else None,
+                "doc_date": item.get('date'),
+            }
+            jobs.append((project_code, doc_data))
+            _changed_project_codes.add(project_code)
+
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        cursor.execute("SELECT id, name, num FROM ledger_accounts")
-        rows = cursor.fetchall()
-        if _USE_SQLITE:
-            acc_map = {row[0]: f"{row[1]} ({row[2]})" if row[2] else row[1] for row in rows}
-        else:
-            acc_map = {r["id"]: f"{r['name']} ({r['num']})" if r["num"] else r["name"] for r in rows}
-
-        for item in data:
-            doc_id = item.get('id')
-            tags   = json.dumps(item.get('tags') or [])
-            notes  = item.get('notes') or ''
-
-            # --- Holded API status derivation (invoices only) --------------------
-            # Holded API status field is unreliable for invoices:
-            #   API 0 = draft (but also returned for approved invoices — buggy)
-            #   API 1 = approved (but doesn't distinguish paid/unpaid/overdue)
-            #   API 3 = cancelled (Anulado)
-            # We derive the real status from multiple fields:
-            #   0 = draft, 1 = pending, 3 = paid, 4 = overdue, 5 = cancelled
-            # Estimates/purchases use different status codes — pass through as-is.
-            api_status = item.get('status')
-            if table == 'invoices':
-                pending = float(_num(item.get('paymentsPending', 0)) or 0)
-                due_ts  = item.get('dueDate')
-
-                if api_status == 3:
-                    raw_status = 5  # cancelled (Anulado)
-                elif api_status == 0 and not item.get('approvedAt'):
-                    raw_status = 0  # truly draft
-                else:
-                    # Approved invoice — derive payment status
-                    if abs(pending) < 0.01:
-                        raw_status = 3  # paid (Pagado)
-                    elif due_ts and isinstance(due_ts, (int, float)) and due_ts < time.time():
-                        raw_status = 4  # overdue (Vencido)
-                    else:
-                        raw_status = 1  # pending (Pendiente)
-            else:
-                raw_status = api_status
-            # -------------------------------------------------------------------
-
-            if table == 'invoices':
-                vals = (doc_id, item.get('contact'), item.get('contactName'), item.get('desc'),
-                        item.get('date'), _num(item.get('total')), raw_status,
-                        _num(item.get('paymentsPending', 0)), _num(item.get('paymentsTotal', 0)),
-                        item.get('dueDate'), item.get('docNumber'), tags, notes)
-                if _USE_SQLITE:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO invoices
-                            (id, contact_id, contact_name, "desc", date, amount, status,
-                             payments_pending, payments_total, due_date, doc_number, tags, notes)
-                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-                    ''', vals)
-                else:
-                    cursor.execute('''
-                        INSERT INTO invoices
-                            (id, contact_id, contact_name, "desc", date, amount, status,
-                             payments_pending, payments_total, due_date, doc_number, tags, notes)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                        ON CONFLICT (id) DO UPDATE SET
-                            contact_id=EXCLUDED.contact_id, contact_name=EXCLUDED.contact_name,
-                            "desc"=EXCLUDED."desc", date=EXCLUDED.date, amount=EXCLUDED.amount,
-                            status=EXCLUDED.status, payments_pending=EXCLUDED.payments_pending,
-                            payments_total=EXCLUDED.payments_total, due_date=EXCLUDED.due_date,
-                            doc_number=EXCLUDED.doc_number, tags=EXCLUDED.tags, notes=EXCLUDED.notes
-                    ''', vals)
-            else:
-                vals = (doc_id, item.get('contact'), item.get('contactName'), item.get('desc'),
-                        item.get('date'), _num(item.get('total')), raw_status,
-                        item.get('docNumber'), tags, notes)
-                if _USE_SQLITE:
-                    cursor.execute(f'''
-                        INSERT OR REPLACE INTO {table}
-                            (id, contact_id, contact_name, "desc", date, amount, status, doc_number, tags, notes)
-                        VALUES (?,?,?,?,?,?,?,?,?,?)
-                    ''', vals)
-                else:
-                    cursor.execute(f'''
-                        INSERT INTO {table}
-                            (id, contact_id, contact_name, "desc", date, amount, status, doc_number, tags, notes)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                        ON CONFLICT (id) DO UPDATE SET
-                            contact_id=EXCLUDED.contact_id, contact_name=EXCLUDED.contact_name,
-                            "desc"=EXCLUDED."desc", date=EXCLUDED.date, amount=EXCLUDED.amount,
-                            status=EXCLUDED.status, doc_number=EXCLUDED.doc_number,
-                            tags=EXCLUDED.tags, notes=EXCLUDED.notes
-                    ''', vals)
-
-            # Items: delete + re-insert (simpler than upsert for SERIAL-keyed rows)
-            cursor.execute(_q(f'DELETE FROM {items_table} WHERE {fk_column} = ?'), (doc_id,))
-            for prod in item.get('products', []):
-                retention = extract_ret(prod)
-                acc_id = prod.get('accountCode') or prod.get('accountName') or prod.get('account')
-                account = acc_map.get(acc_id, acc_id)
-                cursor.execute(_q(f'''
-                    INSERT INTO {items_table}
-                        ({fk_column}, product_id, name, sku, units, price, subtotal,
-                         discount, tax, retention, account, project_id, kind, "desc")
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                '''), (doc_id, prod.get('productId'), prod.get('name'), prod.get('sku'),
-                       _num(prod.get('units')), _num(prod.get('price')), _num(prod.get('subtotal')),
-                       _num(prod.get('discount')), _num(prod.get('tax')), _num(retention), account,
-                       prod.get('projectid'), prod.get('kind'), prod.get('desc')))
-
-            # Extract project code + shooting dates from line items
-            project_code = _extract_project_code(item.get('products'))
-            shooting_raw = _extract_shooting_dates(item.get('products'))
-            cursor.execute(_q(f'UPDATE {table} SET project_code = ?, shooting_dates_raw = ? WHERE id = ?'),
-                           (project_code, shooting_raw, doc_id))
-
-            # If this doc has a project code, ensure job exists
-            if project_code:
-                from skills.job_tracker import ensure_job
-                doc_data = {
-                    "client_id": item.get('contact'),
-                    "client_name": item.get('contactName'),
-                    "shooting_dates_raw": shooting_raw,
-                    "estimate_id": doc_id if table == 'estimates' else None,
-                    "estimate_number": item.get('docNumber') if table == 'estimates' else None,
-                    "invoice_id": doc_id if table == 'invoices' else None,
-                    "invoice_number": item.get('docNumber') if table == 'invoices' else None,
-                    "doc_date": item.get('date'),
-                }
+        if jobs:
+            from skills.job_tracker import ensure_job
+            for project_code, doc_data in jobs:
                 ensure_job(project_code, doc_data, cursor)
-                _changed_project_codes.add(project_code)
+
+        # Batched writes — one transaction, committed below. Every sync pulls
+        # the full history, so most documents come back unchanged: compare
+        # against what is stored and rewrite only documents (and item sets)
+        # that differ, sparing the upsert and index maintenance for the rest.
+        stored_docs, stored_items = _stored_documents(conn, table, items_table, fk_column)
+        changed_docs = [row for doc_id, row in doc_rows.items() if stored_docs.get(doc_id) != row]
+        if changed_docs:
+            cursor.executemany(_SQL_UPSERT_DOC[table], changed_docs)
+        doc_ids = [doc_id for doc_id, rows_for_doc in item_rows.items()
+                   if stored_items.get(doc_id, []) != rows_for_doc]
+        for i in range(0, len(doc_ids), _DELETE_CHUNK):
+            chunk = doc_ids[i:i + _DELETE_CHUNK]
+            cursor.execute(
+                f'DELETE FROM {items_table} WHERE {fk_column} IN ({",".join([_PH] * len(chunk))})', chunk)
+        all_items = [row for doc_id in doc_ids for row in item_rows[doc_id]]
+        # Large rewrites on SQLite (first sync, bulk edits): drop the
+        # secondary indexes after the DELETE (which needs the fk index) and
+        # rebuild them once the rows are in, all inside this transaction.
+        rebuild = (_secondary_indexes(cursor, items_table)
+                   if _USE_SQLITE and len(all_items) >= _INDEX_REBUILD_MIN_ROWS else [])
+        for name, _ in rebuild:
+            cursor.execute(f'DROP INDEX IF EXISTS {name}')
+        _insert_many(cursor, _ITEMS_INSERT_HEAD[items_table], all_items)
+        for _, create_sql in rebuild:
+            cursor.execute(create_sql)
+
+        if items_table == 'invoice_items' and doc_ids:
+            refresh_product_revenue(cursor, {
+                row[1] for doc_id in doc_ids
+                for row in stored_items.get(doc_id, []) + item_rows[doc_id]})
 
         conn.commit()
     finally:
         release_db(conn)
+    if items_table == 'invoice_items':
+        invalidate_amortization_cache()
+    elif items_table == 'purchase_items':
+        # Pending matches show supplier/date/item name from purchase documents
+        invalidate_pending_matches_cache()
 
     # Notify Brain for each changed job — non-blocking, after DB transaction is closed
     if _changed_project_codes:
@@ -180,61 +333,50 @@ def sync_documents(doc_type, table, items_table, fk_column):
             except Exception:
                 pass  # Non-critical — cron will pick it up
 
-    logger.info(f"Synced {len(data)} {doc_type}s and their line items.")
+    logger.info(f"Synced {len(doc_rows)} {doc_type}s and their line items "
+                f"({len(changed_docs)} documents, {len(doc_ids)} item sets rewritten).")
 
 
-def sync_invoices():
-    sync_documents("invoice", "invoices", "invoice_items", "invoice_id")
+def sync_invoices(data=None):
+    sync_documents("invoice", "invoices", "invoice_items", "invoice_id", data)
 
-def sync_purchases():
-    sync_documents("purchase", "purchase_invoices", "purchase_items", "purchase_id")
+def sync_purchases(data=None):
+    sync_documents("purchase", "purchase_invoices", "purchase_items", "purchase_id", data)
 
-def sync_estimates():
-    sync_documents("estimate", "estimates", "estimate_items", "estimate_id")
+def sync_estimates(data=None):
+    sync_documents("estimate", "estimates", "estimate_items", "estimate_id", data)
 
 
-def sync_accounts():
+def sync_accounts(data=None):
     logger.info("Syncing Ledger Accounts (Chart of Accounts)...")
-    data = fetch_data("/accounting/v1/chartofaccounts")
+    if data is None:
+        data = fetch_data(_ENDPOINTS['accounts'])
     conn = get_db()
     try:
         cursor = _cursor(conn)
         accounts = data if isinstance(data, list) else data.get('accounts', [])
-        for item in accounts:
-            vals = (item.get('id'), item.get('name'), item.get('num'))
-            if _USE_SQLITE:
-                cursor.execute("INSERT OR REPLACE INTO ledger_accounts (id, name, num) VALUES (?,?,?)", vals)
-            else:
-                cursor.execute("""
-                    INSERT INTO ledger_accounts (id, name, num) VALUES (%s,%s,%s)
-                    ON CONFLICT (id) DO UPDATE SET name=EXCLUDED.name, num=EXCLUDED.num
-                """, vals)
+        cursor.executemany(_SQL_UPSERT_ACCOUNT,
+                           [(item.get('id'), item.get('name'), item.get('num')) for item in accounts])
         conn.commit()
     finally:
         release_db(conn)
+    _invalidate_account_names()
     logger.info(f"Synced {len(accounts)} ledger accounts.")
 
 
-def sync_products():
+def sync_products(data=None):
     logger.info("Syncing Products (Inventory)...")
-    data = fetch_data("/invoicing/v1/products")
+    if data is None:
+        data = fetch_data(_ENDPOINTS['products'])
     conn = get_db()
     try:
         cursor = _cursor(conn)
+        product_rows = []
         pack_rows = []  # collect (pack_id, component_id, qty) for batch insert
         for item in data:
             kind = item.get('kind', 'simple') or 'simple'
-            vals = (item.get('id'), item.get('name'), item.get('desc'),
-                    _num(item.get('price')), _num(item.get('stock')), item.get('sku'), kind)
-            if _USE_SQLITE:
-                cursor.execute('INSERT OR REPLACE INTO products (id, name, "desc", price, stock, sku, kind) VALUES (?,?,?,?,?,?,?)', vals)
-            else:
-                cursor.execute("""
-                    INSERT INTO products (id, name, "desc", price, stock, sku, kind) VALUES (%s,%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (id) DO UPDATE SET
-                        name=EXCLUDED.name, "desc"=EXCLUDED."desc", price=EXCLUDED.price,
-                        stock=EXCLUDED.stock, sku=EXCLUDED.sku, kind=EXCLUDED.kind
-                """, vals)
+            product_rows.append((item.get('id'), item.get('name'), item.get('desc'),
+                                 _num(item.get('price')), _num(item.get('stock')), item.get('sku'), kind))
 
             # Collect pack composition for batch insert
             if kind == 'pack':
@@ -244,109 +386,121 @@ def sync_products():
                     component_id = raw_pid.split('#')[0] if '#' in raw_pid else raw_pid
                     if component_id:
                         pack_rows.append((pack_id, component_id, _num(pi.get('units', 1)) or 1))
+        cursor.executemany(_SQL_UPSERT_PRODUCT, product_rows)
 
         # Refresh pack_components: DELETE all + re-INSERT (small table, composition may change)
         cursor.execute("DELETE FROM pack_components")
-        for row in pack_rows:
-            if _USE_SQLITE:
-                cursor.execute("INSERT INTO pack_components (pack_id, component_id, quantity) VALUES (?,?,?)", row)
-            else:
-                cursor.execute("INSERT INTO pack_components (pack_id, component_id, quantity) VALUES (%s,%s,%s)", row)
+        cursor.executemany(_SQL_INSERT_PACK_COMPONENT, pack_rows)
         conn.commit()
     finally:
         release_db(conn)
+    invalidate_amortization_cache()
     logger.info(f"Synced {len(data)} products ({len(pack_rows)} pack components).")
 
 
-def sync_contacts():
+def sync_contacts(data=None):
     logger.info("Syncing Contacts...")
-    data = fetch_data("/invoicing/v1/contacts")
+    if data is None:
+        data = fetch_data(_ENDPOINTS['contacts'])
     conn = get_db()
     try:
         cursor = _cursor(conn)
+        rows = []
         for item in data:
             addr = item.get('billAddress') or {}
-            vals = (item.get('id'), item.get('name'), item.get('email'), item.get('type'),
-                    item.get('code'), item.get('vat'), item.get('phone'), item.get('mobile'),
-                    addr.get('countryCode', '') or addr.get('country', ''),
-                    addr.get('address', ''), addr.get('city', ''),
-                    addr.get('province', ''), addr.get('postalCode', ''),
-                    item.get('tradeName', ''), item.get('discount', 0))
-            if _USE_SQLITE:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO contacts (id, name, email, type, code, vat, phone, mobile,
-                        country, address, city, province, postal_code, trade_name, discount)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """, vals)
-            else:
-                cursor.execute("""
-                    INSERT INTO contacts (id, name, email, type, code, vat, phone, mobile,
-                        country, address, city, province, postal_code, trade_name, discount)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (id) DO UPDATE SET
-                        name=EXCLUDED.name, email=EXCLUDED.email, type=EXCLUDED.type,
-                        code=EXCLUDED.code, vat=EXCLUDED.vat, phone=EXCLUDED.phone,
-                        mobile=EXCLUDED.mobile, country=EXCLUDED.country, address=EXCLUDED.address,
-                        city=EXCLUDED.city, province=EXCLUDED.province, postal_code=EXCLUDED.postal_code,
-                        trade_name=EXCLUDED.trade_name, discount=EXCLUDED.discount
-                """, vals)
+            rows.append((item.get('id'), item.get('name'), item.get('email'), item.get('type'),
+                         item.get('code'), item.get('vat'), item.get('phone'), item.get('mobile'),
+                         addr.get('countryCode', '') or addr.get('country', ''),
+                         addr.get('address', ''), addr.get('city', ''),
+                         addr.get('province', ''), addr.get('postalCode', ''),
+                         item.get('tradeName', ''), item.get('discount', 0)))
+        cursor.executemany(_SQL_UPSERT_CONTACT, rows)
         conn.commit()
     finally:
         release_db(conn)
     logger.info(f"Synced {len(data)} contacts.")
 
 
-def sync_projects():
+def sync_projects(data=None):
     logger.info("Syncing Projects...")
-    data = fetch_data("/projects/v1/projects")
+    if data is None:
+        data = fetch_data(_ENDPOINTS['projects'])
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        for item in data:
-            vals = (item.get('id'), item.get('name'), item.get('desc'),
-                    item.get('status'), item.get('customer'), _num(item.get('budget')))
-            if _USE_SQLITE:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO projects (id, name, "desc", status, customer_id, budget)
-                    VALUES (?,?,?,?,?,?)
-                """, vals)
-            else:
-                cursor.execute("""
-                    INSERT INTO projects (id, name, "desc", status, customer_id, budget)
-                    VALUES (%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (id) DO UPDATE SET
-                        name=EXCLUDED.name, "desc"=EXCLUDED."desc", status=EXCLUDED.status,
-                        customer_id=EXCLUDED.customer_id, budget=EXCLUDED.budget
-                """, vals)
+        cursor.executemany(_SQL_UPSERT_PROJECT, [
+            (item.get('id'), item.get('name'), item.get('desc'),
+             item.get('status'), item.get('customer'), _num(item.get('budget')))
+            for item in data])
         conn.commit()
     finally:
         release_db(conn)
     logger.info(f"Synced {len(data)} projects.")
 
 
-def sync_payments():
+def sync_payments(data=None):
     logger.info("Syncing Payments...")
-    data = fetch_data("/invoicing/v1/payments")
+    if data is None:
+        data = fetch_data(_ENDPOINTS['payments'])
     conn = get_db()
     try:
         cursor = _cursor(conn)
-        for item in data:
-            vals = (item.get('id'), item.get('documentId'), _num(item.get('amount')),
-                    item.get('date'), item.get('paymentMethod'), item.get('type'))
-            if _USE_SQLITE:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO payments (id, document_id, amount, date, method, type)
-                    VALUES (?,?,?,?,?,?)
-                """, vals)
-            else:
-                cursor.execute("""
-                    INSERT INTO payments (id, document_id, amount, date, method, type)
-                    VALUES (%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (id) DO UPDATE SET
-                        document_id=EXCLUDED.document_id, amount=EXCLUDED.amount,
-                        date=EXCLUDED.date, method=EXCLUDED.method, type=EXCLUDED.type
-                """, vals)
+        cursor.executemany(_SQL_UPSERT_PAYMENT, [
+            (item.get('id'), item.get('documentId'), _num(item.get('amount')),
+             item.get('date'), item.get('paymentMethod'), item.get('type'))
+            for item in data])
         conn.commit()
     finally:
         release_db(conn)
     logger.info(f"Synced {len(data)} payments.")
+
+
+# ── Full sync pipeline ───────────────────────────────────────────────────────
+# Fetching is network-bound and writing is disk-bound, so a full sync fetches
+# the next entities on worker threads while the current one is written. Writes
+# stay on the caller's thread, one step at a time, which keeps SQLite's single
+# writer. Besides the step being written, at most _SYNC_PREFETCH fetched
+# payloads are held in memory.
+_SYNC_PREFETCH = 2
+
+FULL_SYNC_STEPS = ('accounts', 'contacts', 'products', 'invoices',
+                   'purchases', 'estimates', 'projects', 'payments')
+
+_SYNC_FETCHERS = {
+    'invoices':  lambda: _fetch_documents("invoice"),
+    'purchases': lambda: _fetch_documents("purchase"),
+    'estimates': lambda: _fetch_documents("estimate"),
+    **{name: (lambda ep=ep: fetch_data(ep)) for name, ep in _ENDPOINTS.items()},
+}
+_SYNC_WRITERS = {
+    'accounts': sync_accounts,
+    'contacts': sync_contacts,
+    'products': sync_products,
+    'invoices': sync_invoices,
+    'purchases': sync_purchases,
+    'estimates': sync_estimates,
+    'projects': sync_projects,
+    'payments': sync_payments,
+}
+
+
+def prefetched_sync_steps(steps=FULL_SYNC_STEPS, prefetch=_SYNC_PREFETCH):
+    """Yield (step_name, run) for each step, with fetches running ahead.
+
+    Calling run() waits for that step's fetch and writes it; a failed fetch
+    raises from run(), so callers can handle errors per step exactly as
+    they would around a plain sync_* call.
+    """
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="holded-fetch") as pool:
+        pending = deque()
+        queue = iter(steps)
+        for name in queue:
+            pending.append((name, pool.submit(_SYNC_FETCHERS[name])))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            name, future = pending.popleft()
+            for nxt in queue:
+                pending.append((nxt, pool.submit(_SYNC_FETCHERS[nxt])))
+                break
+            yield name, (lambda w=_SYNC_WRITERS[name], f=future: w(f.result()))
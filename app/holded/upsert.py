@@ -11,6 +11,7 @@ Extracted from connector.py during Fase 5a refactor.
 import json
 import logging
 from app.db.connection import _q, _num, _USE_SQLITE, _row_val
+from app.domain.amortization import refresh_product_revenue
 from app.holded.client import (
     extract_ret,
     _extract_project_code,
@@ -19,6 +20,70 @@ from app.holded.client import (
 
 logger = logging.getLogger(__name__)
 
+_PH = '?' if _USE_SQLITE else '%s'
+# NULL-safe inequality, for change detection in the upsert's WHERE clause.
+_DISTINCT = 'IS NOT' if _USE_SQLITE else 'IS DISTINCT FROM'
+
+
+def _upsert_sql(table, cols):
+    """INSERT-or-update-by-id statement for `table` in the active dialect.
+
+    Native UPSERT on both backends (SQLite >= 3.24): an existing row is
+    updated in place — columns outside `cols` keep their values — and only
+    when some column actually differs, so re-syncing an unchanged row costs
+    a lookup rather than a row and index rewrite.
+    """
+    values = ','.join([_PH] * len(cols))
+    col_list = ', '.join(cols)
+    data_cols = [c for c in cols if c != 'id']
+    updates = ', '.join(f'{c}=excluded.{c}' for c in data_cols)
+    changed = ' OR '.join(f'{table}.{c} {_DISTINCT} excluded.{c}' for c in data_cols)
+    return (f'INSERT INTO {table} ({col_list}) VALUES ({values}) '
+            f'ON CONFLICT (id) DO UPDATE SET {updates} WHERE {changed}')
+
+
+_SINGLE_DOC_COLS = ('id', 'contact_id', 'contact_name', '"desc"', 'date', 'amount', 'status',
+                    'doc_number', 'tags', 'notes')
+_SINGLE_INVOICE_COLS = ('id', 'contact_id', 'contact_name', '"desc"', 'date', 'amount', 'status',
+                        'payments_pending', 'payments_total', 'due_date', 'doc_number', 'tags', 'notes')
+_SQL_UPSERT_SINGLE_DOC = {
+    'invoices':          _upsert_sql('invoices', _SINGLE_INVOICE_COLS),
+    'purchase_invoices': _upsert_sql('purchase_invoices', _SINGLE_DOC_COLS),
+    'estimates':         _upsert_sql('estimates', _SINGLE_DOC_COLS),
+}
+_SQL_UPSERT_SINGLE_CONTACT = _upsert_sql(
+    'contacts', ('id', 'name', 'email', 'type', 'code', 'vat', 'phone', 'mobile'))
+_SQL_UPSERT_SINGLE_PRODUCT = _upsert_sql(
+    'products', ('id', 'name', '"desc"', 'price', 'stock', 'sku', 'kind'))
+
+
+def _item_account_id(prod):
+    """Raw ledger account reference of a Holded line item."""
+    return prod.get('accountCode') or prod.get('accountName') or prod.get('account')
+
+
+def _account_names(cursor, acc_ids=None):
+    """Map ledger account id → display name ("Name (num)", or just the name).
+
+    With `acc_ids`, only those accounts are read (one IN query) — used when a
+    single document is written, so the whole chart of accounts is not shipped
+    into Python for a handful of line items. Without it, every account is read
+    once for a bulk sync."""
+    if acc_ids is not None:
+        acc_ids = list({a for a in acc_ids if a})
+        if not acc_ids:
+            return {}
+        ph = '?' if _USE_SQLITE else '%s'
+        cursor.execute(f'SELECT id, name, num FROM ledger_accounts WHERE id IN ({",".join([ph] * len(acc_ids))})',
+                       acc_ids)
+    else:
+        cursor.execute('SELECT id, name, num FROM ledger_accounts')
+    acc_map = {}
+    for r in cursor.fetchall():
+        name, num = _row_val(r, 'name', 1), _row_val(r, 'num', 2)
+        acc_map[_row_val(r, 'id', 0)] = f"{name} ({num})" if num else name
+    return acc_map
+
 
 def _upsert_single_document(cursor, doc, table, items_table, fk_column):
     """Upsert a single document + its line items into local DB.
@@ -34,15 +99,10 @@ def _upsert_single_document(cursor, doc, table, items_table, fk_column):
     if not doc_id:
         return
 
-    # Build ledger account map for human-readable account names (like sync_documents lines 697-702)
+    # Human-readable names for the ledger accounts this document references
     acc_map = {}
     try:
-        cursor.execute(_q('SELECT id, name, num FROM ledger_accounts'))
-        for r in cursor.fetchall():
-            name = r[1] if isinstance(r, tuple) else r['name']
-            num = r[2] if isinstance(r, tuple) else r.get('num')
-            rid = r[0] if isinstance(r, tuple) else r['id']
-            acc_map[rid] = f"{name} ({num})" if num else name
+        acc_map = _account_names(cursor, (_item_account_id(p) for p in doc.get('products', [])))
     except Exception:
         pass  # No ledger accounts loaded yet — fall through to raw ID
 
@@ -66,26 +126,7 @@ def _upsert_single_document(cursor, doc, table, items_table, fk_column):
             doc.get('notes', '')
         )
 
-        if _USE_SQLITE:
-            cursor.execute(f'''
-                INSERT OR REPLACE INTO {table}
-                    (id, contact_id, contact_name, "desc", date, amount, status,
-                     payments_pending, payments_total, due_date, doc_number, tags, notes)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-            ''', vals)
-        else:
-            cursor.execute(f'''
-                INSERT INTO {table}
-                    (id, contact_id, contact_name, "desc", date, amount, status,
-                     payments_pending, payments_total, due_date, doc_number, tags, notes)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (id) DO UPDATE SET
-                    contact_id=EXCLUDED.contact_id, contact_name=EXCLUDED.contact_name,
-                    "desc"=EXCLUDED."desc", date=EXCLUDED.date, amount=EXCLUDED.amount,
-                    status=EXCLUDED.status, payments_pending=EXCLUDED.payments_pending,
-                    payments_total=EXCLUDED.payments_total, due_date=EXCLUDED.due_date,
-                    doc_number=EXCLUDED.doc_number, tags=EXCLUDED.tags, notes=EXCLUDED.notes
-            ''', vals)
+        cursor.execute(_SQL_UPSERT_SINGLE_DOC[table], vals)
     else:
         # Estimates & purchases: 10 columns (no payment fields)
         vals = (
@@ -101,32 +142,17 @@ def _upsert_single_document(cursor, doc, table, items_table, fk_column):
             doc.get('notes', '')
         )
 
-        if _USE_SQLITE:
-            cursor.execute(f'''
-                INSERT OR REPLACE INTO {table}
-                    (id, contact_id, contact_name, "desc", date, amount, status,
-                     doc_number, tags, notes)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-            ''', vals)
-        else:
-            cursor.execute(f'''
-                INSERT INTO {table}
-                    (id, contact_id, contact_name, "desc", date, amount, status,
-                     doc_number, tags, notes)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (id) DO UPDATE SET
-                    contact_id=EXCLUDED.contact_id, contact_name=EXCLUDED.contact_name,
-                    "desc"=EXCLUDED."desc", date=EXCLUDED.date, amount=EXCLUDED.amount,
-                    status=EXCLUDED.status,
-                    doc_number=EXCLUDED.doc_number, tags=EXCLUDED.tags, notes=EXCLUDED.notes
-            ''', vals)
+        cursor.execute(_SQL_UPSERT_SINGLE_DOC[table], vals)
 
     # Items: delete + re-insert
+    if items_table == 'invoice_items':
+        cursor.execute(_q(f'SELECT product_id FROM {items_table} WHERE {fk_column} = ?'), (doc_id,))
+        touched_products = {_row_val(r, 'product_id', 0) for r in cursor.fetchall()}
     cursor.execute(_q(f'DELETE FROM {items_table} WHERE {fk_column} = ?'), (doc_id,))
     for prod in doc.get('products', []):
         retention = extract_ret(prod)
-        acc_id = prod.get('accountCode') or prod.get('accountName') or prod.get('account')
-        # Resolve ledger account ID to human-readable name (like sync_documents line 760)
+        acc_id = _item_account_id(prod)
+        # Resolve ledger account ID to human-readable name (as sync_documents does)
         account = acc_map.get(acc_id, acc_id)
         cursor.execute(_q(f'''
             INSERT INTO {items_table}
@@ -138,6 +164,10 @@ def _upsert_single_document(cursor, doc, table, items_table, fk_column):
                _num(prod.get('discount')), _num(prod.get('tax')), _num(retention), account,
                prod.get('projectid'), prod.get('kind'), prod.get('desc')))
 
+    if items_table == 'invoice_items':
+        touched_products.update(prod.get('productId') for prod in doc.get('products', []))
+        refresh_product_revenue(cursor, touched_products)
+
     # Extract project code + shooting dates from line items
     project_code = _extract_project_code(doc.get('products'))
     shooting_raw = _extract_shooting_dates(doc.get('products'))
@@ -177,22 +207,7 @@ def _upsert_single_contact(cursor, contact):
         contact.get('mobile', '')
     )
 
-    if _USE_SQLITE:
-        cursor.execute('''
-            INSERT OR REPLACE INTO contacts
-                (id, name, email, type, code, vat, phone, mobile)
-            VALUES (?,?,?,?,?,?,?,?)
-        ''', vals)
-    else:
-        cursor.execute('''
-            INSERT INTO contacts
-                (id, name, email, type, code, vat, phone, mobile)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (id) DO UPDATE SET
-                name=EXCLUDED.name, email=EXCLUDED.email, type=EXCLUDED.type,
-                code=EXCLUDED.code, vat=EXCLUDED.vat, phone=EXCLUDED.phone,
-                mobile=EXCLUDED.mobile
-        ''', vals)
+    cursor.execute(_SQL_UPSERT_SINGLE_CONTACT, vals)
 
 
 def _upsert_single_product(cursor, product):
@@ -211,18 +226,4 @@ def _upsert_single_product(cursor, product):
         product.get('kind', 'simple')
     )
 
-    if _USE_SQLITE:
-        cursor.execute('''
-            INSERT OR REPLACE INTO products
-                (id, name, "desc", price, stock, sku, kind)
-            VALUES (?,?,?,?,?,?,?)
-        ''', vals)
-    else:
-        cursor.execute('''
-            INSERT INTO products
-                (id, name, "desc", price, stock, sku, kind)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (id) DO UPDATE SET
-                name=EXCLUDED.name, "desc"=EXCLUDED."desc", price=EXCLUDED.price,
-                stock=EXCLUDED.stock, sku=EXCLUDED.sku, kind=EXCLUDED.kind
-        ''', vals)
+    cursor.execute(_SQL_UPSERT_SINGLE_PRODUCT, vals)
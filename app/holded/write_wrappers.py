@@ -7,7 +7,8 @@ import re
 import time
 import requests
 from app.db.connection import HEADERS, BASE_URL, SAFE_MODE, _num
-from app.holded.client import post_data, put_data, post_multipart, fetch_data
+from app.db.settings import ensure_config
+from app.holded.client import post_data, put_data, post_multipart, fetch_data, _backoff
 
 # Holded MongoDB ObjectId: 24-char hex string
 _HOLDED_ID_RE = re.compile(r'^[a-f0-9]{24}$')
@@ -39,7 +40,9 @@ def fetch_estimate_fresh(estimate_id):
     """Read estimate items directly from Holded API (not local DB).
     Used by Brain executor and verifier to avoid stale cache."""
     endpoint = f"/invoicing/v1/documents/estimate/{estimate_id}"
+    ensure_config()
     max_retries = 3
+    wait = 2
     for attempt in range(max_retries):
         try:
             url = f"{BASE_URL}{endpoint}"
@@ -72,8 +75,8 @@ def fetch_estimate_fresh(estimate_id):
                 logger.info(f"Fresh read estimate {estimate_id}: {len(items)} items from Holded API")
                 return items
             elif response.status_code == 429:
-                wait = 2 * (attempt + 1)
-                logger.warning(f"Rate limit (429) reading estimate {estimate_id}, waiting {wait}s (attempt {attempt+1})")
+                wait = _backoff(response, 2, wait)
+                logger.warning(f"Rate limit (429) reading estimate {estimate_id}, waiting {wait:.1f}s (attempt {attempt+1})")
                 time.sleep(wait)
                 continue
             else:
@@ -81,7 +84,8 @@ def fetch_estimate_fresh(estimate_id):
                 raise Exception(f"Holded API error: HTTP {response.status_code}")
         except requests.exceptions.Timeout:
             if attempt < max_retries - 1:
-                time.sleep(2)
+                wait = _backoff(None, 2, wait)
+                time.sleep(wait)
                 continue
             raise Exception(f"Holded API timeout reading estimate {estimate_id}")
         except requests.exceptions.RequestException as e:
@@ -6,6 +6,7 @@ favorites, confirmation flow, and AI configuration.
 Extracted from api.py (Fase 4 router split, Task 11).
 """
 from fastapi import APIRouter, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional
@@ -43,7 +44,10 @@ async def ai_chat(body: ChatRequest, request: Request):
     if not ai_agent.check_rate_limit():
         return {"type": "error", "content": "Rate limit exceeded. Please wait a moment."}
     user_role = getattr(getattr(request.state, "user", None), "role", "admin")
-    result = ai_agent.chat(body.message, body.conversation_id, user_role=user_role)
+    # A chat turn blocks on Claude and runs tools (queries, PDF reports), so
+    # it runs on the worker pool instead of stalling the event loop.
+    result = await run_in_threadpool(ai_agent.chat, body.message, body.conversation_id,
+                                     user_role=user_role)
     return result
 
 @router.post("/api/ai/chat/stream")
@@ -65,7 +69,7 @@ async def ai_chat_stream(body: ChatRequest, request: Request):
 
 @router.post("/api/ai/confirm")
 async def ai_confirm(body: ConfirmRequest):
-    result = ai_agent.confirm_action(body.pending_state_id, body.confirmed)
+    result = await run_in_threadpool(ai_agent.confirm_action, body.pending_state_id, body.confirmed)
     return result
 
 @router.get("/api/ai/history")
@@ -17,14 +17,13 @@ Endpoints:
 from fastapi import APIRouter, UploadFile, File, Query
 from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 import connector
 import reports
 import os
 import time
 import io
 import logging
-import pandas as pd
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -39,13 +38,18 @@ class DirectoryConfig(BaseModel):
 
 
 @router.get("/api/reports/excel")
-def download_excel_report():
+def download_excel_report(fmt: Literal["xlsx", "csv"] = Query("xlsx", alias="format")):
     try:
         data_dict = reports.get_financial_summary_data()
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            for sheet_name, df in data_dict.items():
-                df.to_excel(writer, index=False, sheet_name=sheet_name)
+        if fmt == "csv":
+            reports.write_csv_zip(data_dict, output)
+            output.seek(0)
+            headers = {
+                'Content-Disposition': 'attachment; filename="holded_connector_report.zip"'
+            }
+            return StreamingResponse(output, headers=headers, media_type='application/zip')
+        reports.write_excel(data_dict, output)
         output.seek(0)
 
         headers = {
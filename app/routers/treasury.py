@@ -23,6 +23,7 @@ router = APIRouter()
 def get_treasury_accounts():
     """Fetch bank/treasury accounts from Holded API."""
     try:
+        connector.ensure_config()
         url = f"{connector.BASE_URL}/invoicing/v1/treasury"
         response = requests.get(url, headers=connector.HEADERS, timeout=15)
         if response.status_code == 200:
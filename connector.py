@@ -28,8 +28,10 @@ logger = logging.getLogger(__name__)
 get_db = _conn.get_db
 release_db = _conn.release_db
 _cursor = _conn._cursor
+_dict_cursor = _conn._dict_cursor
 _q = _conn._q
 _num = _conn._num
+_insert_many = _conn._insert_many
 _row_val = _conn._row_val
 _fetch_one_val = _conn._fetch_one_val
 insert_audit_log = _conn.insert_audit_log
@@ -39,6 +41,7 @@ db_context = _conn.db_context
 init_db = _schema.init_db
 
 reload_config = _settings.reload_config
+ensure_config = _settings.ensure_config
 get_setting = _settings.get_setting
 save_setting = _settings.save_setting
 
@@ -62,6 +65,8 @@ _MUTABLE_CONN_ATTRS = ('API_KEY', 'DATABASE_URL', '_pool')
 def __getattr__(name):
     """Proxy mutable globals to their canonical module."""
     if name in _MUTABLE_CONN_ATTRS:
+        if name == 'API_KEY':
+            _settings.ensure_config()
         return getattr(_conn, name)
     raise AttributeError(f"module 'connector' has no attribute {name!r}")
 
@@ -97,6 +102,7 @@ from app.holded.sync import (
     sync_contacts,
     sync_projects,
     sync_payments,
+    prefetched_sync_steps,
 )
 
 # ---------------------------------------------------------------------------
@@ -139,7 +145,9 @@ from app.domain.purchase_analysis import (
 from app.domain.inventory_matching import (
     find_inventory_in_purchases,
     save_inventory_match,
+    save_inventory_matches,
     get_pending_matches,
+    invalidate_pending_matches_cache,
     confirm_inventory_match,
 )
 
@@ -152,6 +160,9 @@ from app.domain.amortization import (
     delete_amortization_purchase,
     get_product_type_rules,
     get_pack_info,
+    refresh_product_revenue,
+    invalidate_amortization_cache,
+    iter_amortizations,
     get_amortizations,
     add_amortization,
     update_amortization,
@@ -162,6 +173,7 @@ from app.domain.amortization import (
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    ensure_config()
     if not _conn.API_KEY:
         logger.error("HOLDED_API_KEY not found in .env file.")
     else:
@@ -169,13 +181,11 @@ if __name__ == "__main__":
             logger.warning("SAFE MODE (DRY RUN) ACTIVE - No data will be modified in Holded")
 
         init_db()
-        sync_contacts()
-        sync_products()
-        sync_invoices()
-        sync_estimates()
-        sync_purchases()
-        sync_projects()
-        sync_payments()
+        # Each step's API fetch runs ahead on a worker thread while the
+        # previous step is written; writes stay sequential and in this order.
+        for _step, run in prefetched_sync_steps(('contacts', 'products', 'invoices', 'estimates',
+                                                 'purchases', 'projects', 'payments')):
+            run()
 
         # Flush pending job notes to Obsidian
         try:
@@ -14,6 +14,7 @@ import sys
 import os
 import json
 import re
+from functools import lru_cache
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -39,6 +40,25 @@ def read_file(path):
         return f.read()
 
 
+@lru_cache(maxsize=4)
+def load_context(repo_root):
+    """Devuelve (howto_content, example_json) de repo_root.
+    Se lee una sola vez por repo aunque main() se llame en bucle."""
+    howto_path = os.path.join(repo_root, "funciones", "howtoFunciones.md")
+    howto_content = read_file(howto_path) if os.path.exists(howto_path) else "(sin howto disponible)"
+
+    # Leer un JSON de ejemplo (el más sencillo: 01)
+    example_path = os.path.join(repo_root, "docs", "n8n-flows", "01-sync-programado.json")
+    if os.path.exists(example_path):
+        example_json = read_file(example_path)
+    else:
+        # Fallback: buscar cualquier JSON en n8n-flows
+        flows_dir = os.path.join(repo_root, "docs", "n8n-flows")
+        jsons = [f for f in os.listdir(flows_dir) if f.endswith(".json")]
+        example_json = read_file(os.path.join(flows_dir, jsons[0])) if jsons else "{}"
+    return howto_content, example_json
+
+
 def extract_json_block(text):
     """Extrae el primer bloque ```json ... ``` de la respuesta."""
     match = re.search(r"```json\s*([\s\S]+?)```", text)
@@ -150,19 +170,8 @@ def main():
         print("Error: ANTHROPIC_API_KEY no encontrado en .env ni en variables de entorno")
         sys.exit(1)
 
-    # Leer contexto
-    howto_path = os.path.join(repo_root, "funciones", "howtoFunciones.md")
-    howto_content = read_file(howto_path) if os.path.exists(howto_path) else "(sin howto disponible)"
-
-    # Leer un JSON de ejemplo (el más sencillo: 01)
-    example_path = os.path.join(repo_root, "docs", "n8n-flows", "01-sync-programado.json")
-    if os.path.exists(example_path):
-        example_json = read_file(example_path)
-    else:
-        # Fallback: buscar cualquier JSON en n8n-flows
-        flows_dir = os.path.join(repo_root, "docs", "n8n-flows")
-        jsons = [f for f in os.listdir(flows_dir) if f.endswith(".json")]
-        example_json = read_file(os.path.join(flows_dir, jsons[0])) if jsons else "{}"
+    # Leer contexto (howto + JSON de ejemplo)
+    howto_content, example_json = load_context(repo_root)
 
     md_content = read_file(md_path)
 
@@ -194,6 +194,10 @@ def main():
                 errors.append(f"Failed to create amortization for {prod_id}: {e}")
                 continue
 
+        # Relinked lines change per-product revenue — refresh those products
+        if updated_items:
+            connector.refresh_product_revenue(cur, processed_products)
+
         # ─── Commit ─────────────────────────────────────────────────────────
         print("\nCommitting transaction...")
         conn.commit()
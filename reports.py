@@ -1,34 +1,96 @@
-import pandas as pd
-from fpdf import FPDF
+import io
 import os
 import logging
+import tempfile
+import zipfile
+import importlib.util
+from functools import lru_cache
+from typing import Literal
 import connector
 
+# pandas and fpdf (~0.5 s of imports together) are imported inside the
+# functions that need them, so importing this module — which the API does at
+# startup — does not pay for them until the first report is generated.
+
+HAS_XLSXWRITER = importlib.util.find_spec("xlsxwriter") is not None
+
 logger = logging.getLogger(__name__)
 
-def generate_excel_report(data_list, filename="report.xlsx"):
+
+def _excel_writer(target):
+    """pd.ExcelWriter for `target` (path or file object). Uses xlsxwriter in
+    constant_memory mode when installed: rows are flushed to disk as they are
+    written instead of keeping every sheet as a cell tree like openpyxl."""
+    import pandas as pd
+    if HAS_XLSXWRITER:
+        # Cells are written as given: no per-string URL/formula regex scan,
+        # and a contact name starting with "=" stays text, not a formula.
+        return pd.ExcelWriter(target, engine='xlsxwriter', engine_kwargs={'options': {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'strings_to_formulas': False,
+        }})
+    return pd.ExcelWriter(target, engine='openpyxl')
+
+
+def write_excel(sheets, target):
+    """Write {sheet_name: DataFrame} to `target`, one sheet per entry."""
+    with _excel_writer(target) as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+
+
+def write_csv_zip(sheets, target):
+    """Write {sheet_name: DataFrame} to `target` as a zip with one CSV per
+    sheet. For consumers that only need the numbers this skips the xlsx XML
+    packaging; compresslevel=1 keeps deflate cheap."""
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for sheet_name, df in sheets.items():
+            with zf.open(f"{sheet_name}.csv", 'w') as raw, \
+                    io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+                df.to_csv(f, index=False, lineterminator='\n')
+
+
+def generate_excel_report(data_list, filename="report.xlsx", fmt: Literal["xlsx", "csv"] = "xlsx"):
     """
     Generates an Excel file from a list of dictionaries.
     Saves to the configured reports directory.
+    With fmt='csv' (or a .csv filename) writes plain CSV instead, giving the
+    file a .csv extension.
     """
+    if fmt not in ("xlsx", "csv"):
+        raise ValueError(f"Unsupported report format: {fmt!r}")
+    import pandas as pd
     df = pd.DataFrame(data_list)
     reports_dir = connector.get_reports_dir()
     os.makedirs(reports_dir, exist_ok=True)
     filepath = os.path.join(reports_dir, os.path.basename(filename))
-    df.to_excel(filepath, index=False)
+    if fmt == 'csv' or filepath.endswith('.csv'):
+        filepath = os.path.splitext(filepath)[0] + '.csv'
+        df.to_csv(filepath, index=False, lineterminator='\n')
+        return filepath
+    with _excel_writer(filepath) as writer:
+        df.to_excel(writer, index=False)
     return filepath
 
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(80)
-        self.cell(30, 10, 'Financial Analysis Report', 0, 0, 'C')
-        self.ln(20)
+@lru_cache(maxsize=None)
+def _pdf_class():
+    """The report PDF class, defined on first use (see the note on imports)."""
+    from fpdf import FPDF
+
+    class PDF(FPDF):
+        def header(self):
+            self.set_font('Arial', 'B', 15)
+            self.cell(80)
+            self.cell(30, 10, 'Financial Analysis Report', 0, 0, 'C')
+            self.ln(20)
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 10, 'Page ' + str(self.page_no()) + '/{nb}', 0, 0, 'C')
 
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, 'Page ' + str(self.page_no()) + '/{nb}', 0, 0, 'C')
+    return PDF
 
 def generate_pdf_report(content, filename="analysis.pdf"):
     """
@@ -41,23 +103,54 @@ def generate_pdf_report(content, filename="analysis.pdf"):
 
     clean_content = content.encode('latin-1', 'replace').decode('latin-1').replace('?', ' ')
 
-    pdf = PDF()
+    pdf = _pdf_class()()
     pdf.alias_nb_pages()
     pdf.add_page()
     pdf.set_font('Helvetica', '', 12)
-    pdf.multi_cell(0, 10, clean_content)
-    pdf.output(filepath)
+    # One multi_cell per paragraph keeps each line-breaking pass small
+    # instead of wrapping the whole AI answer in a single call.
+    for paragraph in clean_content.split('\n\n'):
+        pdf.multi_cell(0, 10, paragraph, markdown=False, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(4)
+    # Render in memory, then swap the finished file in so a reader never
+    # opens a half-written PDF.
+    fd, tmp_path = tempfile.mkstemp(dir=reports_dir, suffix='.pdf.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf.output())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
     return filepath
 
+_SUMMARY_QUERIES = {
+    "Invoices": "SELECT id, contact_name, date, amount, status FROM invoices",
+    "Purchases": "SELECT id, contact_name, date, amount, status FROM purchase_invoices",
+}
+
+
 def get_financial_summary_data():
     """
     Gathers a flat list of financial records for Excel export.
     """
+    import pandas as pd
     conn = connector.get_db()
     try:
-        df_invoices = pd.read_sql_query("SELECT id, contact_name, date, amount, status FROM invoices", conn)
-        df_purchases = pd.read_sql_query("SELECT id, contact_name, date, amount, status FROM purchase_invoices", conn)
-        return {"Invoices": df_invoices, "Purchases": df_purchases}
+        # One cursor for both queries instead of read_sql_query's
+        # cursor-per-call; frames are built straight from the fetched tuples.
+        cur = conn.cursor()
+        if connector._USE_SQLITE:
+            cur.row_factory = None  # plain tuples, not the pool's sqlite3.Row
+        frames = {}
+        for sheet, sql in _SUMMARY_QUERIES.items():
+            cur.execute(sql)
+            rows = cur.fetchall()
+            frames[sheet] = pd.DataFrame.from_records(rows, columns=[d[0] for d in cur.description])
+        return frames
     except Exception as e:
         logger.error(f"Excel data gather error: {e}")
         return {}
@@ -0,0 +1,197 @@
+"""Unit tests for app/domain/amortization.py — revenue attribution and ROI.
+
+Runs against a throwaway SQLite file (DB_NAME is patched per test), so it
+never touches the real holded.db.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app.db.connection as _conn
+from app.db.schema import init_db
+from app.domain import amortization as amort
+
+pytestmark = pytest.mark.skipif(not _conn._USE_SQLITE, reason="SQLite-only fixture")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    amort.invalidate_amortization_cache()
+    init_db()
+    conn = _conn.get_db()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT INTO products (id, name, price, kind) VALUES (?,?,?,?)", [
+            ("cam", "Camera", 100.0, "simple"),
+            ("lens", "Lens", 50.0, "simple"),
+            ("kit", "Camera Kit", 150.0, "pack"),
+        ])
+        cur.executemany("INSERT INTO pack_components (pack_id, component_id, quantity) VALUES (?,?,?)", [
+            ("kit", "cam", 1), ("kit", "lens", 1),
+        ])
+        cur.executemany(
+            "INSERT INTO invoice_items (invoice_id, product_id, units, price, subtotal) VALUES (?,?,?,?,?)", [
+                ("inv1", "cam", 1, 200.0, 200.0),
+                ("inv2", "cam", 2, 50.0, None),      # no subtotal → units × price
+                ("inv3", "kit", 1, 300.0, 300.0),    # pack line, split 2:1 cam:lens
+            ])
+        amort.refresh_product_revenue(cur)
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    yield
+
+
+class TestGetAmortizations:
+    def test_direct_and_pack_revenue(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        rows = amort.get_amortizations()
+        assert len(rows) == 1
+        r = rows[0]
+        assert r["direct_revenue"] == 300.0
+        assert r["pack_revenue"] == 200.0
+        assert r["pack_count"] == 1
+        assert r["total_revenue"] == 500.0
+        assert r["profit"] == 0.0
+        assert r["status"] == "AMORTIZADO"
+        assert r["type_label"] == "Alquiler"
+
+    def test_no_revenue(self, db):
+        amort.add_amortization("lens", "Lens", 400.0, "2026-02-01")
+        r = amort.get_amortizations()[0]
+        assert r["direct_revenue"] == 0.0
+        assert r["pack_revenue"] == 100.0
+        assert r["roi_pct"] == -75.0
+        assert r["status"] == "EN CURSO"
+
+    def test_order_by_purchase_date_desc(self, db):
+        amort.add_amortization("cam", "Camera", 1.0, "2025-01-01")
+        amort.add_amortization("lens", "Lens", 1.0, "2026-01-01")
+        assert [r["product_id"] for r in amort.get_amortizations()] == ["lens", "cam"]
+
+    def test_iter_streams_across_chunks(self, db):
+        amort.add_amortization("cam", "Camera", 1.0, "2025-01-01")
+        amort.add_amortization("lens", "Lens", 1.0, "2026-01-01")
+        streamed = list(amort.iter_amortizations(chunk_size=1))
+        assert streamed == amort.get_amortizations()
+
+    def test_refresh_tracks_invoice_lines(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        conn = _conn.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM invoice_items WHERE invoice_id = 'inv1'")
+            amort.refresh_product_revenue(cur)
+            conn.commit()
+        finally:
+            _conn.release_db(conn)
+        assert amort.get_amortizations()[0]["direct_revenue"] == 100.0
+
+    def test_incremental_refresh_touches_only_given_products(self, db):
+        conn = _conn.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM invoice_items WHERE product_id = 'kit'")
+            cur.execute("UPDATE invoice_items SET subtotal = 10 WHERE invoice_id = 'inv1'")
+            amort.refresh_product_revenue(cur, ["kit", None])
+            conn.commit()
+            rows = [tuple(r) for r in cur.execute(
+                "SELECT product_id, revenue, line_count FROM product_revenue ORDER BY product_id")]
+        finally:
+            _conn.release_db(conn)
+        # kit has no lines left → dropped; cam was not named → left as it was.
+        assert rows == [("cam", 300.0, 2)]
+
+
+class TestCache:
+    def test_hit_skips_recompute(self, db, monkeypatch):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        first = amort.get_amortizations()
+        monkeypatch.setattr(amort, "iter_amortizations", lambda *a, **k: iter(()))
+        assert amort.get_amortizations() == first
+
+    def test_external_write_changes_fingerprint(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        assert len(amort.get_amortizations()) == 1
+        conn = _conn.get_db()
+        try:
+            conn.execute("INSERT INTO amortizations (product_id, product_name, purchase_price, purchase_date) "
+                         "VALUES ('lens', 'Lens', 1, '2026-02-01')")
+            conn.commit()
+        finally:
+            _conn.release_db(conn)
+        assert len(amort.get_amortizations()) == 2
+
+    def _external(self, sql):
+        conn = _conn.get_db()
+        try:
+            conn.execute(sql)
+            conn.commit()
+        finally:
+            _conn.release_db(conn)
+
+    def test_external_same_second_edit_is_seen(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        assert amort.get_amortizations()[0]["notes"] != "serviced"
+        self._external("UPDATE amortizations SET notes = 'serviced'")  # updated_at unchanged
+        assert amort.get_amortizations()[0]["notes"] == "serviced"
+
+    def test_external_type_rule_edit_is_seen(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        assert amort.get_amortizations()[0]["type_label"] != "Renamed"
+        self._external("UPDATE product_type_rules SET label = 'Renamed', irpf_pct = 7 "
+                       "WHERE type_key = 'alquiler'")
+        r = amort.get_amortizations()[0]
+        assert (r["type_label"], r["irpf_pct"]) == ("Renamed", 7)
+
+    def test_external_pack_quantity_edit_is_seen(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        assert amort.get_amortizations()[0]["pack_revenue"] == 200.0
+        self._external("UPDATE pack_components SET quantity = 2 WHERE component_id = 'lens'")
+        assert amort.get_amortizations()[0]["pack_revenue"] == 150.0
+
+
+class TestSummary:
+    def test_summary_totals(self, db):
+        amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        amort.add_amortization("lens", "Lens", 400.0, "2026-02-01")
+        s = amort.get_amortization_summary()
+        assert s["total_invested"] == 900.0
+        assert s["total_revenue"] == 600.0
+        assert s["total_profit"] == -300.0
+        assert s["total_products"] == 2
+        assert s["amortized_count"] == 1
+        assert s["in_progress_count"] == 1
+
+    def test_empty(self, db):
+        s = amort.get_amortization_summary()
+        assert s["total_products"] == 0
+        assert s["global_roi_pct"] == 0
+
+
+class TestWrites:
+    def test_update_and_delete(self, db):
+        new_id = amort.add_amortization("cam", "Camera", 500.0, "2026-01-01")
+        assert amort.update_amortization(new_id, purchase_price=100.0, notes="x")
+        r = amort.get_amortizations()[0]
+        assert r["purchase_price"] == 100.0
+        assert r["notes"] == "x"
+        assert amort.delete_amortization(new_id)
+        assert amort.get_amortizations() == []
+
+    def test_purchase_links_recalc_price(self, db):
+        new_id = amort.add_amortization("cam", "Camera", 0, "2026-01-01")
+        link = amort.add_amortization_purchase(new_id, 120.0, "body")
+        amort.add_amortization_purchase(new_id, 30.0, "strap")
+        assert amort.get_amortizations()[0]["purchase_price"] == 150.0
+        amort.update_amortization_purchase(link, cost_override=100.0)
+        assert amort.get_amortizations()[0]["purchase_price"] == 130.0
+        amort.delete_amortization_purchase(link)
+        assert amort.get_amortizations()[0]["purchase_price"] == 30.0
+        assert [p["allocation_note"] for p in amort.get_amortization_purchases(new_id)] == ["strap"]
+
+    def test_pack_rejected(self, db):
+        with pytest.raises(ValueError):
+            amort.add_amortization("kit", "Camera Kit", 1.0, "2026-01-01")
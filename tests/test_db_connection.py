@@ -0,0 +1,154 @@
+"""Unit tests for app/db/connection.py — SQLite connection reuse."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+
+import pytest
+
+import app.db.connection as _conn
+
+pytestmark = pytest.mark.skipif(not _conn._USE_SQLITE, reason="SQLite-only")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    yield
+
+
+def test_released_connection_is_reused(db):
+    c1 = _conn.get_db()
+    _conn.release_db(c1)
+    c2 = _conn.get_db()
+    try:
+        assert c2 is c1
+    finally:
+        _conn.release_db(c2)
+
+
+def test_nested_get_db_gets_distinct_connection(db):
+    outer = _conn.get_db()
+    inner = _conn.get_db()
+    try:
+        assert inner is not outer
+    finally:
+        _conn.release_db(inner)
+        _conn.release_db(outer)
+
+
+def test_release_rolls_back_uncommitted_work(db):
+    conn = _conn.get_db()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    _conn.release_db(conn)
+    conn = _conn.get_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    finally:
+        _conn.release_db(conn)
+
+
+def test_double_release_is_harmless(db):
+    conn = _conn.get_db()
+    _conn.release_db(conn)
+    _conn.release_db(conn)
+    a, b = _conn.get_db(), _conn.get_db()
+    try:
+        assert a is not b
+    finally:
+        _conn.release_db(a)
+        _conn.release_db(b)
+
+
+def test_changed_db_name_opens_new_connection(db, tmp_path, monkeypatch):
+    conn = _conn.get_db()
+    _conn.release_db(conn)
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "other.db"))
+    other = _conn.get_db()
+    try:
+        assert other is not conn
+    finally:
+        _conn.release_db(other)
+
+
+@pytest.mark.parametrize("n", [0, 1, 3, 7, 8])
+def test_insert_many_chunks_and_tail(db, n):
+    conn = _conn.get_db()
+    try:
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+        rows = [(i, f"r{i}") for i in range(n)]
+        _conn._insert_many(conn.cursor(), "INSERT INTO t (a, b)", rows, chunk_size=4)
+        assert [tuple(r) for r in conn.execute("SELECT a, b FROM t ORDER BY a")] == rows
+    finally:
+        _conn.release_db(conn)
+
+
+def test_dict_cursor_tracks_columns_across_statements(db):
+    conn = _conn.get_db()
+    try:
+        cur = _conn._dict_cursor(conn)
+        cur.execute("SELECT 1 AS a, 2 AS b UNION ALL SELECT 3, 4")
+        assert cur.fetchall() == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+        cur.execute("SELECT 5 AS c")
+        assert cur.fetchall() == [{"c": 5}]
+    finally:
+        _conn.release_db(conn)
+
+
+def test_short_lived_threads_do_not_accumulate_connections(db):
+    import threading
+
+    def work():
+        conn = _conn.get_db()
+        conn.execute("SELECT 1")
+        _conn.release_db(conn)
+
+    for _ in range(20):
+        t = threading.Thread(target=work)
+        t.start()
+        t.join()
+    assert len(_conn._sqlite_free) <= _conn._SQLITE_POOL_MAX
+    # A connection parked by a finished thread is reused by the next caller.
+    conn = _conn.get_db()
+    try:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+    finally:
+        _conn.release_db(conn)
+
+
+def test_init_db_sets_page_size_only_on_new_files(db, tmp_path, monkeypatch):
+    from app.db import schema
+    schema.init_db()
+    conn = _conn.get_db()
+    try:
+        assert conn.execute("PRAGMA page_size").fetchone()[0] == schema._SQLITE_PAGE_SIZE
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        _conn.release_db(conn)
+
+    old = str(tmp_path / "old.db")
+    legacy = sqlite3.connect(old)
+    legacy.execute("PRAGMA page_size=4096")
+    legacy.execute("CREATE TABLE t (x)")
+    legacy.commit()
+    legacy.close()
+    monkeypatch.setattr(_conn, "DB_NAME", old)
+    schema.init_db()
+    conn = _conn.get_db()
+    try:
+        assert conn.execute("PRAGMA page_size").fetchone()[0] == 4096
+    finally:
+        _conn.release_db(conn)
+
+
+def test_connection_pragmas(db):
+    conn = _conn.get_db()
+    try:
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1   # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2    # MEMORY
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+    finally:
+        _conn.release_db(conn)
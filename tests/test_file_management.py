@@ -0,0 +1,20 @@
+"""Unit tests for app/domain/file_management.py — upload listing."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.domain import file_management as fm
+
+
+def test_list_uploaded_files_newest_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(fm, "get_uploads_dir", lambda: str(tmp_path))
+    for i, name in enumerate(["old.csv", "mid.xlsx", "new", "skip.pdf"]):
+        p = tmp_path / name
+        p.write_bytes(b"x" * (i + 1))
+        os.utime(p, (1000 + i, 1000 + i))
+    (tmp_path / "subdir").mkdir()
+    os.utime(tmp_path / "skip.pdf", (10, 10))
+
+    files = fm.list_uploaded_files(limit=3)
+    assert [f["name"] for f in files] == ["new", "mid.xlsx", "old.csv"]
+    assert files[0] == {"name": "new", "size": 3, "uploaded_at": 1002.0, "type": "unknown"}
+    assert files[1]["type"] == "xlsx"
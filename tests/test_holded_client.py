@@ -0,0 +1,157 @@
+"""Unit tests for app/holded/client.py — paginated fetch_data (no network)."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import threading
+
+import pytest
+
+from app.db import settings
+from app.holded import client
+
+
+class _Resp:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = ""
+        self.headers = {}
+        self.content = json.dumps(payload).encode()
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Serve `pages` (page number → list or status code) through the shared session."""
+    calls = []
+    lock = threading.Lock()
+    pages = {}
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        with lock:
+            calls.append(params["page"])
+        served = pages.get(params["page"], [])
+        if isinstance(served, int):
+            return _Resp(served)
+        return _Resp(200, served)
+
+    monkeypatch.setattr(client._SESSION, "get", fake_get)
+    monkeypatch.setattr(client.time, "sleep", lambda s: None)
+    monkeypatch.setattr(settings, "_config_loaded", True)   # no settings DB read
+    return pages, calls
+
+
+def test_single_short_page(fake_api):
+    pages, calls = fake_api
+    pages[1] = [{"id": 1}]
+    assert client.fetch_data("/x", {"limit": 2}) == [{"id": 1}]
+    assert calls == [1]
+
+
+def test_pages_concatenated_in_order(fake_api):
+    pages, _ = fake_api
+    for p in range(1, 7):
+        pages[p] = [{"id": p * 10}, {"id": p * 10 + 1}]
+    pages[7] = [{"id": 70}]
+    ids = [r["id"] for r in client.fetch_data("/x", {"limit": 2})]
+    assert ids == [10, 11, 20, 21, 30, 31, 40, 41, 50, 51, 60, 61, 70]
+
+
+def test_failed_page_returns_data_before_it(fake_api):
+    pages, _ = fake_api
+    pages[1] = [{"id": 1}, {"id": 2}]
+    pages[2] = [{"id": 3}, {"id": 4}]
+    pages[3] = 404
+    pages[4] = [{"id": 7}, {"id": 8}]
+    assert [r["id"] for r in client.fetch_data("/x", {"limit": 2})] == [1, 2, 3, 4]
+
+
+def test_non_list_response_passthrough(fake_api):
+    pages, _ = fake_api
+    pages[1] = {"accounts": []}
+    assert client.fetch_data("/x") == {"accounts": []}
+
+
+def test_caller_params_untouched(fake_api):
+    params = {"starttmp": 1}
+    client.fetch_data("/x", params)
+    assert params == {"starttmp": 1}
+
+
+def test_parse_json_with_and_without_orjson(monkeypatch):
+    resp = _Resp(200, {"a": [1, 2]})
+    assert client._parse_json(resp) == {"a": [1, 2]}
+    monkeypatch.setattr(client, "HAS_ORJSON", False)
+    assert client._parse_json(resp) == {"a": [1, 2]}
+
+
+@pytest.mark.parametrize("prod, expected", [
+    ({"retention": 15}, 15),
+    ({"retention": 0, "taxes": ["s_iva_21", "s_ret_15"]}, 15.0),
+    ({"taxes": "s_iva_21,s_ret_7.5"}, 7.5),
+    ({"taxes": "s_iva_21,s_ret_15 "}, 15.0),
+    ({"taxes": ["s_ret_ 19\n"]}, 19.0),
+    ({"taxes": ["s_ret_abc", "s_ret_19"]}, 19.0),
+    ({"taxes": ["s_iva_21"]}, 0),
+    ({}, 0),
+])
+def test_extract_ret(prod, expected):
+    assert client.extract_ret(prod) == expected
+
+
+def test_in_flight_requests_are_capped(fake_api, monkeypatch):
+    pages, _ = fake_api
+    for p in range(1, 40):
+        pages[p] = [{"id": p}, {"id": -p}]
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    served = client._SESSION.get
+
+    def counting_get(*a, **k):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            threading.Event().wait(0.002)  # time.sleep is patched out
+            return served(*a, **k)
+        finally:
+            with lock:
+                active[0] -= 1
+    monkeypatch.setattr(client._SESSION, "get", counting_get)
+
+    def run():
+        client.fetch_data("/x", {"limit": 2})
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= client._FETCH_WORKERS
+
+
+def test_stopped_page_is_not_requested(fake_api):
+    pages, calls = fake_api
+    pages[3] = [{"id": 3}]
+    stop = threading.Event()
+    stop.set()
+    assert client._fetch_page("/x", {"limit": 2}, 3, stop=stop) is None
+    assert calls == []
+
+
+@pytest.mark.parametrize("retry_after, expected", [("7", 7), ("60", 60), ("120", 60), ("3600", 60)])
+def test_backoff_honours_retry_after(retry_after, expected):
+    resp = _Resp(429)
+    resp.headers["Retry-After"] = retry_after
+    assert client._backoff(resp, 5, 0) == expected
+
+
+def test_backoff_jitter_bounded():
+    prev = 0
+    for _ in range(50):
+        wait = client._backoff(_Resp(429), 5, prev)
+        assert 5 <= wait <= min(client._BACKOFF_CAP, max(5, prev * 3))
+        prev = wait
+    assert prev <= client._BACKOFF_CAP
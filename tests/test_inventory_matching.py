@@ -0,0 +1,140 @@
+"""Unit tests for app/domain/inventory_matching.py — purchase → product matching."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app.db.connection as _conn
+from app.db.schema import init_db
+from app.domain import inventory_matching as im
+
+
+class TestScore:
+    def test_substring(self):
+        assert im._score("profoto b10", "flash profoto b10 plus kit") == 0.96
+        assert im._score("sony a7 iv body camera", "sony a7 iv") == 0.93
+
+    def test_token_overlap(self):
+        assert im._score("aputure light dome", "dome softbox for aputure light") == pytest.approx(0.95)
+
+    def test_fuzzy_fallback(self):
+        assert im._score("manfrotto tripod", "manfroto tripode") >= 0.72
+        assert im._score("manfrotto tripod", "coffee beans") < 0.5
+
+    def test_empty(self):
+        assert im._score("", "anything") == 0.0
+
+    def test_cached_matcher_scores_like_plain_ratio(self):
+        from functools import lru_cache
+        matcher = lru_cache(maxsize=None)(im._item_matcher)
+        products = ["manfrotto tripod", "godox ad600 pro", "sony fe 24-70mm f2.8 gm ii"]
+        items = ["manfroto tripode", "godox ad600pro witstro flash kit with battery", "coffee beans",
+                 "sony 24-70 gm lens"]
+        for p in products:
+            for i in items:
+                assert im._score(p, i, matcher=matcher) == im._score(p, i)
+
+    def test_cutoff_only_drops_scores_below_it(self):
+        pairs = [("manfrotto tripod", "manfroto tripode"), ("manfrotto tripod", "coffee beans"),
+                 ("godox ad600 pro", "godox ad600pro flash"), ("sony fe 24-70mm", "sony 24-70 gm lens")]
+        for p, i in pairs:
+            full = im._score(p, i)
+            for cutoff in (0.3, 0.72, 0.9):
+                # At or above the cutoff the score is exact; below it the
+                # bounds may short-circuit to 0.0.
+                assert im._score(p, i, cutoff=cutoff) in ((full,) if full >= cutoff else (full, 0.0))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    if not _conn._USE_SQLITE:
+        pytest.skip("SQLite-only fixture")
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    im.invalidate_pending_matches_cache()
+    init_db()
+    conn = _conn.get_db()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT INTO products (id, name) VALUES (?,?)", [
+            ("p1", "Profoto B10"), ("p2", "2x Manfrotto Tripod"), ("p3", "Unrelated Gadget"),
+            ("p4", "Linked Lens"),
+        ])
+        cur.executemany("INSERT INTO purchase_invoices (id, contact_name, date) VALUES (?,?,?)", [
+            ("pu1", "Shop", 1767268800), ("pu2", "Shop", None),
+        ])
+        cur.executemany(
+            "INSERT INTO purchase_items (purchase_id, product_id, name, price, units) VALUES (?,?,?,?,?)", [
+                ("pu1", None, "B08GTYFC37 - Profoto B10 flash", 1200.0, 1),
+                ("pu1", None, "Manfrotto tripod", 150.0, 2),
+                ("pu2", "p4", "whatever", 80.0, 1),
+                ("pu2", None, "Factura taxi Profoto B10", 20.0, 1),   # noise, skipped
+            ])
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    yield
+
+
+def test_find_inventory_in_purchases(db):
+    matches = {m["product_id"]: m for m in im.find_inventory_in_purchases()}
+    assert set(matches) == {"p1", "p2", "p4"}
+    assert matches["p1"]["matched_price"] == 1200.0
+    assert matches["p1"]["matched_date"] == "2026-01-01"
+    assert matches["p1"]["match_method"] == "fuzzy_96pct"
+    assert matches["p4"]["match_method"] == "exact_id"
+    assert matches["p4"]["matched_date"] == ""
+
+
+def test_save_inventory_matches_batch_skips_existing(db):
+    matches = im.find_inventory_in_purchases()
+    assert im.save_inventory_matches(matches) == len(matches)
+    assert im.save_inventory_matches(matches) == 0
+    assert im.save_inventory_matches([]) == 0
+    assert {m["product_id"] for m in im.get_pending_matches()} == {m["product_id"] for m in matches}
+
+
+def test_confirm_reports_new_or_existing_amortization(db):
+    im.save_inventory_matches(im.find_inventory_in_purchases())
+    pending = {m["product_id"]: m for m in im.get_pending_matches()}
+
+    first = im.confirm_inventory_match(pending["p1"]["id"], True)
+    assert first["ok"] and first["added_to_amortizations"] is True
+    assert first["price_used"] == 1200.0
+
+    conn = _conn.get_db()
+    try:
+        conn.execute("INSERT INTO amortizations (product_id, product_name, purchase_price, purchase_date) "
+                     "VALUES ('p2', 'Manfrotto Tripod', 0, '2025-01-01')")
+        existing_id = conn.execute("SELECT id FROM amortizations WHERE product_id='p2'").fetchone()[0]
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    second = im.confirm_inventory_match(pending["p2"]["id"], True, custom_price=99)
+    assert second["added_to_amortizations"] is False
+    assert second["amortization_id"] == existing_id
+    assert {m["product_id"] for m in im.get_pending_matches()} == {"p4"}
+
+
+class TestPendingCache:
+    def test_hit_skips_query(self, db, monkeypatch):
+        im.save_inventory_matches(im.find_inventory_in_purchases())
+        first = im.get_pending_matches()
+        monkeypatch.setattr(im, "_SQL_PENDING_MATCHES", "SELECT 1 WHERE 0")
+        assert im.get_pending_matches() == first
+
+    def test_writes_invalidate(self, db):
+        im.save_inventory_matches(im.find_inventory_in_purchases())
+        pending = im.get_pending_matches()
+        im.confirm_inventory_match(pending[0]["id"], False)
+        assert len(im.get_pending_matches()) == len(pending) - 1
+
+    def test_external_write_changes_fingerprint(self, db):
+        im.save_inventory_matches(im.find_inventory_in_purchases())
+        pending = im.get_pending_matches()
+        conn = _conn.get_db()
+        try:
+            conn.execute("UPDATE inventory_matches SET status='rejected' WHERE id=?", (pending[0]["id"],))
+            conn.commit()
+        finally:
+            _conn.release_db(conn)
+        assert len(im.get_pending_matches()) == len(pending) - 1
@@ -0,0 +1,91 @@
+"""Unit tests for app/domain/purchase_analysis.py — rule-based categorization."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.domain import purchase_analysis as pa
+
+
+@pytest.fixture(params=["automaton", "scan"])
+def matcher(request, monkeypatch):
+    """Run each test through both the Aho-Corasick path and the plain scan."""
+    if request.param == "automaton":
+        if not pa.HAS_AHOCORASICK:
+            pytest.skip("pyahocorasick not installed")
+    else:
+        monkeypatch.setattr(pa, "_KEYWORD_AUTOMATON", None)
+    return pa.categorize_by_rules
+
+
+class TestCategorizeByRules:
+    def test_supplier_match(self, matcher):
+        r = matcher("", "Adobe Systems Software", [])
+        assert (r["category"], r["subcategory"]) == ("SOFTWARE", "adobe")
+        assert r["reasoning"] == "Keyword match: 'adobe'"
+
+    def test_item_names_are_searched(self, matcher):
+        r = matcher(None, "Proveedor", ["Billete Renfe Madrid"])
+        assert r["subcategory"] == "renfe"
+
+    def test_earlier_rule_wins_regardless_of_text_position(self, matcher):
+        # "uber eats" (VARIOS) also contains "uber" (TRANSPORTE, earlier rule)
+        r = matcher("pedido uber eats", "", [])
+        assert (r["category"], r["subcategory"]) == ("TRANSPORTE", "uber")
+        # "seguro" appears first in the text, but iberdrola's rule comes first in CATEGORY_RULES
+        r = matcher("seguro hogar iberdrola", "", [])
+        assert r["subcategory"] == "agua y luz"
+
+    def test_first_keyword_of_rule_reported(self, matcher):
+        r = matcher("cabify y taxi", "", [])
+        assert r["reasoning"] == "Keyword match: 'taxi'"
+
+    def test_no_match(self, matcher):
+        assert matcher("something else", "Unknown SL", []) is None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    import app.db.connection as _conn
+    from app.db.schema import init_db
+    if not _conn._USE_SQLITE:
+        pytest.skip("SQLite-only fixture")
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    init_db()
+    conn = _conn.get_db()
+    try:
+        conn.executemany("INSERT INTO purchase_invoices (id, contact_name, amount, date) VALUES (?,?,?,?)", [
+            ("p1", "Adobe", 60.0, 3), ("p2", "Renfe", 40.0, 2), ("p3", "Other", 10.0, 1),
+        ])
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    yield
+
+
+def test_analysis_stats(db):
+    assert pa.get_analysis_stats()["analyzed"] == 0
+    pa.save_purchase_analysis("p1", "SOFTWARE", "adobe", "high", "rules", "")
+    pa.save_purchase_analysis("p2", "TRANSPORTE", "renfe", "high", "rules", "")
+    s = pa.get_analysis_stats()
+    assert (s["total"], s["analyzed"], s["pending"], s["pct"]) == (3, 2, 1, 66.7)
+    assert [(c["category"], c["count"]) for c in s["by_category"]] == [("SOFTWARE", 1), ("TRANSPORTE", 1)]
+    assert s["last_run_db"] is not None
+
+
+def test_unanalyzed_purchases_newest_first_with_items(db):
+    import app.db.connection as _conn
+    conn = _conn.get_db()
+    try:
+        conn.executemany("INSERT INTO purchase_items (purchase_id, name) VALUES (?,?)", [
+            ("p2", "Billete"), ("p2", "Suplemento"),
+        ])
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    pa.save_purchase_analysis("p1", "SOFTWARE", "adobe", "high", "rules", "")
+    rows = pa.get_unanalyzed_purchases(limit=5)
+    assert [r["id"] for r in rows] == ["p2", "p3"]
+    assert sorted(rows[0]["item_names"]) == ["Billete", "Suplemento"]
+    assert rows[1]["item_names"] == []
+    assert [r["id"] for r in pa.get_unanalyzed_purchases(limit=1)] == ["p2"]
@@ -0,0 +1,122 @@
+"""Unit tests for reports.py — PDF and spreadsheet exports."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import threading
+import zipfile
+
+import pandas as pd
+import pytest
+
+import connector
+import reports
+
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(connector, "get_reports_dir", lambda: str(tmp_path))
+    return tmp_path
+
+
+def test_concurrent_pdf_reports_same_name(reports_dir):
+    errors = []
+
+    def write():
+        try:
+            reports.generate_pdf_report("word " * 5000, "same.pdf")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert os.listdir(reports_dir) == ["same.pdf"]
+    assert (reports_dir / "same.pdf").read_bytes().startswith(b"%PDF-")
+
+
+def test_failed_pdf_write_leaves_no_temp_file(reports_dir, monkeypatch):
+    def boom(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(reports.os, "replace", boom)
+    with pytest.raises(OSError):
+        reports.generate_pdf_report("text", "broken.pdf")
+    assert os.listdir(reports_dir) == []
+
+
+def _sheets():
+    return {
+        "Invoices": pd.DataFrame({"id": ["a", "b"], "contact_name": ["Foo, S.L.", "Ñandú"], "amount": [1.5, 2]}),
+        "Purchases": pd.DataFrame({"id": [], "amount": []}),
+    }
+
+
+def test_write_csv_zip_one_member_per_sheet():
+    buf = io.BytesIO()
+    reports.write_csv_zip(_sheets(), buf)
+    with zipfile.ZipFile(io.BytesIO(buf.getvalue())) as zf:
+        assert zf.namelist() == ["Invoices.csv", "Purchases.csv"]
+        assert zf.read("Invoices.csv").decode("utf-8") == (
+            'id,contact_name,amount\na,"Foo, S.L.",1.5\nb,Ñandú,2.0\n')
+        assert zf.read("Purchases.csv").decode("utf-8") == "id,amount\n"
+
+
+def test_generate_excel_report_csv_uses_csv_extension(reports_dir):
+    path = reports.generate_excel_report([{"a": 1}], fmt="csv")
+    assert path == str(reports_dir / "report.csv")
+    assert (reports_dir / "report.csv").read_text() == "a\n1\n"
+    assert not (reports_dir / "report.xlsx").exists()
+
+
+def test_generate_excel_report_rejects_unknown_format(reports_dir):
+    with pytest.raises(ValueError):
+        reports.generate_excel_report([{"a": 1}], fmt="ods")
+
+
+def test_excel_endpoint_csv_zip(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.routers import files as files_router
+
+    monkeypatch.setattr(reports, "get_financial_summary_data", _sheets)
+    app = FastAPI()
+    app.include_router(files_router.router)
+    client = TestClient(app)
+
+    resp = client.get("/api/reports/excel", params={"format": "csv"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert zf.namelist() == ["Invoices.csv", "Purchases.csv"]
+        assert zf.read("Invoices.csv").startswith(b"id,contact_name,amount\n")
+
+    assert client.get("/api/reports/excel", params={"format": "ods"}).status_code == 422
+
+
+@pytest.mark.skipif(not connector._USE_SQLITE, reason="SQLite-only fixture")
+def test_financial_summary_frames_from_plain_tuples(tmp_path, monkeypatch):
+    import sqlite3
+    import app.db.connection as _conn
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    connector.init_db()
+    conn = connector.get_db()
+    try:
+        conn.execute("INSERT INTO invoices (id, contact_name, date, amount, status) "
+                     "VALUES ('i1', 'Acme', 1700000000, 121.0, 1)")
+        conn.commit()
+    finally:
+        connector.release_db(conn)
+
+    seen = []
+    real_from_records = pd.DataFrame.from_records
+    monkeypatch.setattr(pd.DataFrame, "from_records",
+                        lambda rows, **kw: seen.extend(rows) or real_from_records(rows, **kw))
+    frames = reports.get_financial_summary_data()
+    assert list(frames) == ["Invoices", "Purchases"]
+    assert frames["Invoices"].to_dict("records") == [
+        {"id": "i1", "contact_name": "Acme", "date": 1700000000, "amount": 121.0, "status": 1}]
+    assert list(frames["Purchases"].columns) == ["id", "contact_name", "date", "amount", "status"]
+    assert seen and all(type(r) is tuple and not isinstance(r, sqlite3.Row) for r in seen)
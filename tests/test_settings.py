@@ -0,0 +1,97 @@
+"""Unit tests for app/db/settings.py — cached settings reads."""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app.db.connection as _conn
+from app.db import settings
+from app.db.schema import init_db
+
+pytestmark = pytest.mark.skipif(not _conn._USE_SQLITE, reason="SQLite-only fixture")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    init_db()
+    settings.invalidate_settings_cache()
+    yield
+    settings.invalidate_settings_cache()
+
+
+def test_save_then_get(db):
+    assert settings.get_setting("uploads_dir", "dflt") == "dflt"
+    settings.save_setting("uploads_dir", "/data/up")
+    assert settings.get_setting("uploads_dir") == "/data/up"
+
+
+def test_cache_hit_skips_db(db, monkeypatch):
+    settings.save_setting("k", "v")
+    assert settings.get_setting("k") == "v"
+    monkeypatch.setattr(_conn, "get_db", lambda: pytest.fail("settings read hit the DB"))
+    assert settings.get_setting("k") == "v"
+
+
+def test_write_from_another_connection_is_seen(db):
+    settings.save_setting("k", "v1")
+    assert settings.get_setting("k") == "v1"
+    other = _conn._sqlite_connect()   # stands in for another process
+    try:
+        other.execute("UPDATE settings SET value = 'v2' WHERE key = 'k'")
+        other.commit()
+    finally:
+        other.close()
+    assert settings.get_setting("k") == "v2"
+
+
+def test_ensure_config_loads_api_key_once(db, monkeypatch):
+    settings.save_setting("holded_api_key", "from-db")
+    monkeypatch.setattr(settings, "_config_loaded", False)
+    monkeypatch.setattr(_conn, "API_KEY", "from-env")
+    monkeypatch.setitem(_conn.HEADERS, "key", "from-env")
+    settings.ensure_config()
+    assert _conn.API_KEY == "from-db" and _conn.HEADERS["key"] == "from-db"
+    monkeypatch.setattr(settings, "reload_config", lambda: pytest.fail("config reloaded twice"))
+    settings.ensure_config()
+
+
+_FRESH_PROCESS_SCRIPT = """
+import requests
+import api
+from app.db import settings
+from app.db.connection import HEADERS
+from app.holded import write_wrappers
+
+at_import = HEADERS["key"]
+
+sent = []
+class _Resp:
+    status_code = 200
+    def json(self):
+        return {"products": []}
+requests.get = lambda url, headers=None, **kw: sent.append(headers["key"]) or _Resp()
+write_wrappers.fetch_estimate_fresh("e1")
+
+settings._config_loaded = False
+HEADERS["key"] = None
+api.on_startup()
+api.on_shutdown()
+print(at_import, sent[0], HEADERS["key"])
+"""
+
+
+def test_fresh_process_sends_key_saved_in_settings(db):
+    """A key saved through the UI (not in the env) reaches Holded from a new process."""
+    import subprocess
+    settings.save_setting("holded_api_key", "SECRETKEY")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {k: v for k, v in os.environ.items() if k not in ("HOLDED_API_KEY", "DATABASE_URL")}
+    env["DB_NAME"] = _conn.DB_NAME
+    out = subprocess.run([sys.executable, "-c", _FRESH_PROCESS_SCRIPT], cwd=root, env=env,
+                         capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    at_import, sent, after_startup = out.stdout.split()[-3:]
+    assert at_import == "None"        # importing never opens the database
+    assert sent == "SECRETKEY"        # direct requests.get call sites load it
+    assert after_startup == "SECRETKEY"
@@ -0,0 +1,250 @@
+"""Unit tests for app/holded/sync.py — batched bulk-sync writes.
+
+fetch_data / iter_pages are patched to return canned API payloads; the DB is a throwaway
+SQLite file, so nothing touches Holded or the real holded.db.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app.db.connection as _conn
+from app.db.schema import init_db
+from app.holded import sync
+
+pytestmark = pytest.mark.skipif(not _conn._USE_SQLITE, reason="SQLite-only fixture")
+
+
+def _doc(doc_id, products, **extra):
+    doc = {"id": doc_id, "contact": "c1", "contactName": "ACME", "desc": "",
+           "date": 1767225600, "total": 100, "status": 1, "approvedAt": 1,
+           "paymentsPending": 0, "docNumber": doc_id.upper(), "products": products}
+    doc.update(extra)
+    return doc
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(_conn, "DB_NAME", str(tmp_path / "test.db"))
+    sync._invalidate_account_names()
+    init_db()
+    yield
+
+
+def _fake_api(monkeypatch, fetch):
+    """Serve `fetch(endpoint, params)` through both of sync's fetch seams."""
+    monkeypatch.setattr(sync, "fetch_data", fetch)
+    monkeypatch.setattr(sync, "iter_pages", lambda endpoint, params=None: iter([fetch(endpoint, params)]))
+
+
+def _run(monkeypatch, payload, table="invoices", items_table="invoice_items", fk="invoice_id"):
+    _fake_api(monkeypatch, lambda *a, **k: payload)
+    sync.sync_documents("invoice", table, items_table, fk)
+
+
+def _query(sql, params=()):
+    conn = _conn.get_db()
+    try:
+        return [tuple(r) for r in conn.execute(sql, params).fetchall()]
+    finally:
+        _conn.release_db(conn)
+
+
+def test_inserts_documents_and_items(db, monkeypatch):
+    _run(monkeypatch, [
+        _doc("a", [{"productId": "cam", "name": "Camera", "units": 1, "price": 50, "subtotal": 50}]),
+        _doc("b", [{"productId": "cam", "name": "Camera", "units": 2, "price": 25, "subtotal": 50},
+                   {"name": "Transport", "units": 1, "price": 10, "subtotal": 10}]),
+    ])
+    assert _query("SELECT id, status FROM invoices ORDER BY id") == [("a", 3), ("b", 3)]
+    assert _query("SELECT invoice_id, COUNT(*) FROM invoice_items GROUP BY invoice_id ORDER BY 1") == \
+        [("a", 1), ("b", 2)]
+    assert _query("SELECT revenue, line_count FROM product_revenue WHERE product_id = 'cam'") == [(100.0, 2)]
+
+
+def test_resync_replaces_items(db, monkeypatch):
+    _run(monkeypatch, [_doc("a", [{"name": "Old", "units": 1, "price": 1}] * 3)])
+    _run(monkeypatch, [_doc("a", [{"name": "New", "units": 1, "price": 1}]), _doc("b", [])])
+    assert _query("SELECT invoice_id, name FROM invoice_items") == [("a", "New")]
+    assert _query("SELECT COUNT(*) FROM invoices") == [(2,)]
+
+
+def test_duplicate_document_written_once(db, monkeypatch):
+    _run(monkeypatch, [
+        _doc("a", [{"name": "First", "units": 1, "price": 1}]),
+        _doc("a", [{"name": "Second", "units": 1, "price": 1}], total=200),
+    ])
+    assert _query("SELECT amount FROM invoices") == [(200.0,)]
+    assert _query("SELECT name FROM invoice_items") == [("Second",)]
+
+
+def test_non_invoice_table_columns(db, monkeypatch):
+    _run(monkeypatch, [_doc("e1", [{"name": "Item", "units": 1, "price": 5}], status=2)],
+         table="estimates", items_table="estimate_items", fk="estimate_id")
+    assert _query("SELECT id, status, doc_number FROM estimates") == [("e1", 2, "E1")]
+    assert _query("SELECT estimate_id, name FROM estimate_items") == [("e1", "Item")]
+
+
+def test_sync_products_and_pack_components(db, monkeypatch):
+    monkeypatch.setattr(sync, "fetch_data", lambda *a, **k: [
+        {"id": "cam", "name": "Camera", "price": 100, "stock": 2},
+        {"id": "kit", "name": "Kit", "price": "", "kind": "pack",
+         "packItems": [{"pid": "cam#1", "units": 2}, {"pid": "lens"}]},
+    ])
+    sync.sync_products()
+    assert _query("SELECT id, price, kind FROM products ORDER BY id") == \
+        [("cam", 100.0, "simple"), ("kit", None, "pack")]
+    assert _query("SELECT component_id, quantity FROM pack_components ORDER BY 1") == \
+        [("cam", 2.0), ("lens", 1.0)]
+
+
+def test_product_resync_updates_in_place(db, monkeypatch):
+    payload = [{"id": "cam", "name": "Camera", "price": 100, "stock": 2}]
+    monkeypatch.setattr(sync, "fetch_data", lambda *a, **k: payload)
+    sync.sync_products()
+    conn = _conn.get_db()
+    try:
+        conn.execute("UPDATE products SET web_include = 0 WHERE id = 'cam'")
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    payload[0]["price"] = 120
+    sync.sync_products()
+    # Local-only columns survive a re-sync (INSERT OR REPLACE reset them).
+    assert _query("SELECT price, web_include FROM products WHERE id = 'cam'") == [(120.0, 0)]
+
+
+def _seed_accounts():
+    conn = _conn.get_db()
+    try:
+        conn.executemany("INSERT INTO ledger_accounts (id, name, num) VALUES (?,?,?)", [
+            ("acc1", "Ventas", "70000000"), ("acc2", "Otros", None),
+        ])
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+
+
+def test_account_names_resolved_in_bulk_sync(db, monkeypatch):
+    _seed_accounts()
+    _run(monkeypatch, [_doc("a", [
+        {"name": "A", "units": 1, "price": 1, "accountCode": "acc1"},
+        {"name": "B", "units": 1, "price": 1, "account": "acc2"},
+        {"name": "C", "units": 1, "price": 1, "account": "unknown"},
+    ])])
+    assert _query("SELECT name, account FROM invoice_items ORDER BY name") == \
+        [("A", "Ventas (70000000)"), ("B", "Otros"), ("C", "unknown")]
+
+
+def test_account_map_reloaded_after_account_sync(db, monkeypatch):
+    _seed_accounts()
+    _run(monkeypatch, [_doc("a", [{"name": "A", "units": 1, "price": 1, "account": "acc1"}])])
+    sync.sync_accounts(data=[{"id": "acc1", "name": "Ventas UE", "num": "70000001"}])
+    _run(monkeypatch, [_doc("a", [{"name": "A", "units": 2, "price": 1, "account": "acc1"}])])
+    assert _query("SELECT account FROM invoice_items") == [("Ventas UE (70000001)",)]
+
+
+def test_account_names_resolved_in_single_document_upsert(db):
+    from app.holded.upsert import _upsert_single_document
+    _seed_accounts()
+    conn = _conn.get_db()
+    try:
+        _upsert_single_document(conn.cursor(), _doc("s1", [
+            {"name": "A", "units": 1, "price": 1, "accountCode": "acc1"},
+        ]), "invoices", "invoice_items", "invoice_id")
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    assert _query("SELECT account FROM invoice_items") == [("Ventas (70000000)",)]
+
+
+def test_single_document_upsert_refreshes_old_and_new_products(db, monkeypatch):
+    from app.holded.upsert import _upsert_single_document
+    _run(monkeypatch, [_doc("a", [{"productId": "cam", "units": 1, "price": 5, "subtotal": 5}]),
+                       _doc("b", [{"productId": "cam", "units": 1, "price": 7, "subtotal": 7}])])
+    conn = _conn.get_db()
+    try:
+        _upsert_single_document(conn.cursor(), _doc("a", [
+            {"productId": "lens", "units": 1, "price": 3, "subtotal": 3},
+        ]), "invoices", "invoice_items", "invoice_id")
+        conn.commit()
+    finally:
+        _conn.release_db(conn)
+    assert _query("SELECT product_id, revenue, line_count FROM product_revenue ORDER BY 1") == \
+        [("cam", 7.0, 1), ("lens", 3.0, 1)]
+
+
+def test_prefetched_steps_write_in_order_and_isolate_failures(db, monkeypatch):
+    def fake_fetch(endpoint, params=None):
+        if endpoint.endswith("/projects"):
+            raise RuntimeError("boom")
+        if endpoint.endswith("/documents/invoice"):
+            return [_doc("a", [{"productId": "cam", "units": 1, "price": 5, "subtotal": 5}])]
+        return []
+    _fake_api(monkeypatch, fake_fetch)
+    done, failed = [], []
+    for name, run in sync.prefetched_sync_steps():
+        try:
+            run()
+            done.append(name)
+        except RuntimeError:
+            failed.append(name)
+    assert done + failed == [s for s in sync.FULL_SYNC_STEPS if s != "projects"] + ["projects"]
+    assert failed == ["projects"]
+    assert _query("SELECT id FROM invoices") == [("a",)]
+
+
+def test_resync_skips_unchanged_documents(db, monkeypatch):
+    lines = [{"productId": "cam", "name": "Camera", "units": 1, "price": 0.1, "subtotal": 0.1,
+              "taxes": ["s_ret_15"]}]
+    payload = [_doc("a", lines, tags=["x"]), _doc("b", lines)]
+    _run(monkeypatch, payload)
+    before = _query("SELECT id, invoice_id FROM invoice_items ORDER BY id")
+    _run(monkeypatch, payload)
+    assert _query("SELECT id, invoice_id FROM invoice_items ORDER BY id") == before
+
+    payload[1] = _doc("b", lines + lines, total=200)
+    _run(monkeypatch, payload)
+    after = _query("SELECT id, invoice_id FROM invoice_items ORDER BY id")
+    assert [r for r in after if r[1] == "a"] == [r for r in before if r[1] == "a"]
+    assert [r[1] for r in after].count("b") == 2
+    assert _query("SELECT amount FROM invoices WHERE id = 'b'") == [(200.0,)]
+
+
+def test_bulk_rewrite_rebuilds_item_indexes(db, monkeypatch):
+    monkeypatch.setattr(sync, "_INDEX_REBUILD_MIN_ROWS", 1)
+    index_sql = "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'invoice_items' ORDER BY name"
+    before = _query(index_sql)
+    assert {"idx_inv_items_product_revenue", "idx_inv_items_invoice"} <= {name for name, _ in before}
+    _run(monkeypatch, [_doc("a", [{"productId": "cam", "units": 1, "price": 5, "subtotal": 5}])])
+    assert _query(index_sql) == before
+    assert _query("SELECT invoice_id, product_id FROM invoice_items") == [("a", "cam")]
+
+
+def test_pages_are_consumed_before_the_write_transaction(db, monkeypatch):
+    opened = []
+    real_get_db = sync.get_db
+    monkeypatch.setattr(sync, "get_db", lambda: opened.append("db") or real_get_db())
+
+    def pages(endpoint, params=None):
+        for doc_id in ("a", "b"):
+            opened.append(f"page {doc_id}")
+            yield [_doc(doc_id, [])]
+    monkeypatch.setattr(sync, "iter_pages", pages)
+    sync.sync_documents("invoice", "invoices", "invoice_items", "invoice_id")
+    # One short read for the account names, then every page, then the writes.
+    assert opened == ["db", "page a", "page b", "db"]
+    assert _query("SELECT id FROM invoices ORDER BY id") == [("a",), ("b",)]
+
+
+def test_postgres_branch_never_drops_item_indexes(db, monkeypatch):
+    # Dialect-independent part of the PG path: with _USE_SQLITE off, the
+    # index drop/rebuild is skipped however large the rewrite is.
+    monkeypatch.setattr(sync, "_INDEX_REBUILD_MIN_ROWS", 1)
+    monkeypatch.setattr(sync, "_USE_SQLITE", False)
+
+    def no_rebuild(*a, **k):
+        raise AssertionError("index rebuild attempted on PostgreSQL")
+    monkeypatch.setattr(sync, "_secondary_indexes", no_rebuild)
+    _run(monkeypatch, [_doc("a", [{"productId": "cam", "units": 1, "price": 5, "subtotal": 5}])])
+    assert _query("SELECT invoice_id, product_id FROM invoice_items") == [("a", "cam")]